@@ -1,9 +1,11 @@
 from fastapi import APIRouter
-from app.api.api_v1.endpoints import predictions, users, auth, analytics
+from app.api.api_v1.endpoints import predictions, users, auth, analytics, admin, events
 
 api_router = APIRouter()
 
 api_router.include_router(auth.router, prefix="/auth", tags=["authentication"])
 api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(predictions.router, prefix="/predictions", tags=["predictions"])
-api_router.include_router(analytics.router, prefix="/analytics", tags=["analytics"])
\ No newline at end of file
+api_router.include_router(analytics.router, prefix="/analytics", tags=["analytics"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
+api_router.include_router(events.router, prefix="/events", tags=["events"])
\ No newline at end of file
@@ -0,0 +1,147 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import List
+from datetime import datetime
+import os
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.memory import memory_governor
+from app.models.models import User
+from app.services.ml_service import ml_service
+from app.services.inference_replicas import get_replica_pool
+from app.services.inference_scheduler import inference_scheduler
+from app.api.deps import get_current_superuser
+from app.schemas.admin import (
+    ModelVersionResponse, ModelReloadRequest, ModelReloadResponse,
+    RolloutStatsResponse, ShadowConfigRequest, CanaryConfigRequest,
+    SchedulerStatsResponse, ReplicaStatsResponse, MemoryStatsResponse, UserRoleRequest, UserRoleResponse
+)
+
+router = APIRouter()
+
+@router.get("/models", response_model=List[ModelVersionResponse])
+def list_model_versions(
+    current_user: User = Depends(get_current_superuser)
+):
+    """List model versions known to the registry"""
+    return [
+        ModelVersionResponse(
+            version=info["version"],
+            active=info["active"],
+            status=info["status"],
+            path=info["path"],
+            loaded_at=datetime.fromtimestamp(info["loaded_at"]) if info["loaded_at"] else None,
+            error=info["error"]
+        )
+        for info in ml_service.registry.list_versions()
+    ]
+
+@router.post("/models/reload", response_model=ModelReloadResponse, status_code=status.HTTP_202_ACCEPTED)
+def reload_model(
+    reload_in: ModelReloadRequest,
+    current_user: User = Depends(get_current_superuser)
+):
+    """Load a model version in the background and swap it in without downtime"""
+    filename = reload_in.filename or f"{reload_in.version}.h5"
+    model_dir = os.path.realpath(settings.MODEL_DIR)
+    model_path = os.path.realpath(os.path.join(model_dir, filename))
+
+    if os.path.commonpath([model_dir, model_path]) != model_dir:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Model file must be inside the model directory"
+        )
+
+    if not os.path.exists(model_path):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Model file not found: {filename}"
+        )
+
+    ml_service.reload_model(reload_in.version, model_path, activate=reload_in.activate)
+
+    return ModelReloadResponse(
+        version=reload_in.version,
+        status="loading",
+        message="Model is loading in the background; poll /admin/models for status"
+    )
+
+def _ensure_loaded(version: str):
+    try:
+        ml_service.registry.get(version)
+    except KeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Model version {version} is not loaded; load it with activate=false first"
+        )
+
+@router.get("/rollout", response_model=RolloutStatsResponse)
+def get_rollout_stats(
+    current_user: User = Depends(get_current_superuser)
+):
+    """Get shadow and canary latency and agreement statistics"""
+    return ml_service.rollout.stats()
+
+@router.put("/rollout/shadow", response_model=RolloutStatsResponse)
+def configure_shadow(
+    shadow_in: ShadowConfigRequest,
+    current_user: User = Depends(get_current_superuser)
+):
+    """Mirror a fraction of requests to a candidate model off the response path"""
+    if shadow_in.version:
+        _ensure_loaded(shadow_in.version)
+    ml_service.rollout.configure_shadow(shadow_in.version, shadow_in.sample_rate)
+    return ml_service.rollout.stats()
+
+@router.put("/rollout/canary", response_model=RolloutStatsResponse)
+def configure_canary(
+    canary_in: CanaryConfigRequest,
+    current_user: User = Depends(get_current_superuser)
+):
+    """Serve a percentage of requests from a candidate model with automatic rollback"""
+    if canary_in.version:
+        _ensure_loaded(canary_in.version)
+    ml_service.rollout.configure_canary(canary_in.version, canary_in.traffic_percent)
+    return ml_service.rollout.stats()
+
+@router.get("/scheduler", response_model=SchedulerStatsResponse)
+def get_scheduler_stats(
+    current_user: User = Depends(get_current_superuser)
+):
+    """Get inference queue depth and queue wait per priority class"""
+    return inference_scheduler.stats()
+
+@router.get("/replicas", response_model=List[ReplicaStatsResponse])
+def get_replica_stats(
+    current_user: User = Depends(get_current_superuser)
+):
+    """Get the core set, load and latency of each inference replica (empty when running in-process)"""
+    replica_pool = get_replica_pool()
+    return replica_pool.stats() if replica_pool is not None else []
+
+@router.get("/memory", response_model=MemoryStatsResponse)
+def get_memory_stats(
+    current_user: User = Depends(get_current_superuser)
+):
+    """Get worker RSS, admission state and memory high-water marks per processing stage"""
+    return memory_governor.stats()
+
+@router.put("/users/{user_id}/role", response_model=UserRoleResponse)
+def update_user_role(
+    user_id: int,
+    role_in: UserRoleRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Set a user's role; integration users are scheduled as bulk inference"""
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    user.role = role_in.role
+    db.commit()
+    db.refresh(user)
+    return user
\ No newline at end of file
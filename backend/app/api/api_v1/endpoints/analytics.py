@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from typing import Dict, Any
+import orjson
 
 from app.core.database import get_db
+from app.core.http_cache import cached_json_response, dashboard_data_version, prediction_data_version
 from app.models.models import Prediction, User
 from app.api.deps import get_current_user
 from app.schemas.analytics import AnalyticsResponse, UserStatsResponse
@@ -12,11 +14,19 @@ router = APIRouter()
 
 @router.get("/dashboard", response_model=AnalyticsResponse)
 def get_dashboard_analytics(
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get dashboard analytics data"""
-    
+    return cached_json_response(
+        request,
+        "global",
+        dashboard_data_version(db),
+        lambda: orjson.dumps(_dashboard_analytics(db).model_dump())
+    )
+
+def _dashboard_analytics(db: Session) -> AnalyticsResponse:
     # Total predictions
     total_predictions = db.query(Prediction).count()
     
@@ -55,11 +65,19 @@ def get_dashboard_analytics(
 
 @router.get("/user-stats", response_model=UserStatsResponse)
 def get_user_stats(
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get current user's statistics"""
-    
+    return cached_json_response(
+        request,
+        f"user:{current_user.id}",
+        prediction_data_version(db, current_user.id),
+        lambda: orjson.dumps(_user_stats(db, current_user).model_dump())
+    )
+
+def _user_stats(db: Session, current_user: User) -> UserStatsResponse:
     # User's total predictions
     user_predictions = db.query(Prediction).filter(
         Prediction.user_id == current_user.id
@@ -8,7 +8,9 @@ from passlib.context import CryptContext
 
 from app.core.config import settings
 from app.core.database import get_db
+from app.core.http_cache import response_cache
 from app.models.models import User
+from app.services.event_broker import event_broker, DASHBOARD_CHANNEL
 from app.schemas.auth import Token, UserCreate, UserResponse
 from app.schemas.user import UserLogin
 
@@ -73,6 +75,9 @@ def register(
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    # The dashboard counts users
+    response_cache.invalidate("global")
+    event_broker.publish(DASHBOARD_CHANNEL, "dashboard.updated", {"delta": {"total_users": 1}})
     
     return UserResponse(
         id=db_user.id,
@@ -0,0 +1,90 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from typing import Optional
+import asyncio
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.event_broker import event_broker, user_channel, DASHBOARD_CHANNEL
+from app.api.deps import authenticate_token, accepting_work
+
+router = APIRouter()
+
+def _authenticate(token: str):
+    # A short-lived session: a get_db dependency would hold a connection for the whole stream
+    db = SessionLocal()
+    try:
+        return authenticate_token(db, token)
+    finally:
+        db.close()
+
+async def _event_stream(request: Request, subscription, last_event_id: Optional[int]):
+    try:
+        # Reconnect delay for the browser's EventSource, in milliseconds
+        yield b"retry: 3000\n\n"
+
+        last_sent = last_event_id or 0
+        if last_event_id is not None:
+            missed = await run_in_threadpool(event_broker.replay, subscription.channels, last_event_id)
+            if missed is None:
+                # Too far behind for replay; the client should refetch over REST
+                yield b"event: resync\ndata: {}\n\n"
+            else:
+                for event in missed:
+                    yield event.encode()
+                    last_sent = event.id
+
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), settings.EVENTS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield b": heartbeat\n\n"
+                continue
+            if event is None:
+                # Fell too far behind; the client reconnects with Last-Event-ID
+                return
+            if event.id > last_sent:
+                yield event.encode()
+                last_sent = event.id
+    finally:
+        event_broker.unsubscribe(subscription)
+
+@router.get("/stream", dependencies=[Depends(accepting_work)])
+async def stream_events(
+    request: Request,
+    token: Optional[str] = Query(None, description="Access token, for EventSource clients that cannot set headers"),
+    last_event_id: Optional[int] = Header(None, alias="Last-Event-ID")
+):
+    """
+    Stream prediction-completed and dashboard update events (text/event-stream).
+
+    Subscribes to the current user's channel and the dashboard channel.
+    Reconnecting with Last-Event-ID replays missed events.
+    """
+    if token is None:
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Not authenticated",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+    current_user = await run_in_threadpool(_authenticate, token)
+
+    if event_broker.subscriber_count >= settings.EVENTS_MAX_SUBSCRIBERS:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many open event streams, please retry later",
+            headers={"Retry-After": "30"}
+        )
+
+    # Subscribe before replaying so nothing published in between is lost
+    subscription = event_broker.subscribe([user_channel(current_user.id), DASHBOARD_CHANNEL])
+    return StreamingResponse(
+        _event_stream(request, subscription, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
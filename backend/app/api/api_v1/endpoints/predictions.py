@@ -1,23 +1,105 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, UploadFile, File, Query, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 import os
+import asyncio
+import csv
+import io
 import uuid
+import zlib
+import orjson
 import aiofiles
 from datetime import datetime
 
-from app.core.database import get_db
+from app.core.database import get_db, SessionLocal
 from app.core.config import settings
+from app.core.http_cache import cached_json_response, invalidate_predictions, prediction_data_version
+from app.core.memory import memory_governor, estimate_image_memory, MemoryPressureError
+from app.core.shutdown import drain_state
 from app.models.models import Prediction, User
 from app.services.ml_service import ml_service
-from app.api.deps import get_current_user
-from app.schemas.prediction import PredictionCreate, PredictionResponse
+from app.services.event_broker import publish_prediction_completed
+from app.services.duplicate_index import duplicate_index, perceptual_hash
+from app.services.explanations import cached_explanation, compute_explanation
+from app.services.inference_scheduler import inference_scheduler, SchedulerClosedError, SchedulerFullError
+from app.services.inference_replicas import predict_image
+from app.api.deps import get_current_user, accepting_work
+from app.schemas.prediction import (
+    PredictionCreate, PredictionResponse, InferenceMode, InferencePriority, ExportFormat,
+    DuplicateMatch, NearDuplicateResponse
+)
 
 router = APIRouter()
 
-@router.post("/upload", response_model=PredictionResponse)
+# Explanations run beside regular inference; cap how many this worker computes at once
+explain_semaphore = asyncio.Semaphore(settings.EXPLAIN_MAX_CONCURRENCY)
+
+def _resolve_priority(user: User, requested: Optional[InferencePriority]) -> str:
+    """Scheduling class for an upload: bulk roles are capped at bulk unless superuser"""
+    default = "bulk" if user.role in settings.INFERENCE_BULK_ROLES else "interactive"
+    if requested is None:
+        return default
+    if requested == InferencePriority.interactive and default == "bulk" and not user.is_superuser:
+        return default
+    return requested.value
+
+def _discard_upload(file_path: str):
+    """Remove a failed upload, unless its Prediction row was already committed and refers to it"""
+    if drain_state.release_upload(file_path) and os.path.exists(file_path):
+        os.remove(file_path)
+
+def _predict_with_headroom(file_path: str, dimensions: Optional[tuple], mode: Optional[str]) -> dict:
+    """
+    Scheduler job for an upload. Memory for the decoded image is reserved
+    when a worker picks the job up, not while it waits in the queue, so
+    queued uploads are bounded by INFERENCE_MAX_QUEUED alone.
+    """
+    with memory_governor.reserve(estimate_image_memory(*(dimensions or (0, 0)))):
+        return predict_image(file_path, mode=mode)
+
+def _reusable_result(db: Session, matches, user_id: int, mode: str) -> Optional[dict]:
+    """
+    Result of the nearest near-duplicate close enough to reuse, produced by
+    the active model version in the same inference mode, or None. It keeps
+    the original's processing_time so reuse does not skew the average.
+    """
+    reusable = [prediction_id for prediction_id, distance in matches if distance <= settings.DUPLICATE_REUSE_MAX_DISTANCE]
+    if not reusable:
+        return None
+    rows = {
+        row.id: row
+        for row in db.execute(
+            select(*PREDICTION_COLUMNS).where(
+                Prediction.id.in_(reusable),
+                Prediction.user_id == user_id,
+                Prediction.model_version == ml_service.model_version,
+                Prediction.inference_mode == mode
+            )
+        ).all()
+    }
+    for prediction_id in reusable:
+        if prediction_id in rows:
+            earlier = _serialize_prediction(rows[prediction_id])
+            return {
+                "prediction": earlier["prediction"],
+                "confidence": earlier["confidence"],
+                "probabilities": earlier["probabilities"],
+                "processing_time": earlier["processing_time"],
+                "model_version": earlier["model_version"],
+                "inference_mode": earlier["inference_mode"],
+                "duplicate_of": prediction_id,
+            }
+    return None
+
+@router.post("/upload", response_model=PredictionResponse, dependencies=[Depends(accepting_work)])
 async def upload_and_predict(
     file: UploadFile = File(...),
+    mode: Optional[InferenceMode] = Query(None, description="fast or augmented; defaults to DEFAULT_INFERENCE_MODE"),
+    priority: Optional[InferencePriority] = Query(None, description="interactive or bulk; defaults from the user's role"),
+    reuse_duplicates: bool = Query(False, description="Reuse the result of a near-identical earlier upload instead of running the model"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -48,6 +130,14 @@ async def upload_and_predict(
             detail=f"File too large. Maximum size: {settings.MAX_FILE_SIZE / (1024*1024):.1f}MB"
         )
     
+    # Check decoded size from the header alone; a small file can still decode to gigabytes
+    dimensions = ml_service.image_dimensions(io.BytesIO(content))
+    if dimensions is not None and dimensions[0] * dimensions[1] > settings.MAX_DECODED_PIXELS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Image dimensions too large. Maximum: {settings.MAX_DECODED_PIXELS} pixels"
+        )
+    
     # Generate unique filename
     unique_filename = f"{uuid.uuid4()}_{file.filename}"
     file_path = os.path.join(settings.UPLOAD_DIR, unique_filename)
@@ -55,6 +145,8 @@ async def upload_and_predict(
     # Ensure upload directory exists
     os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
     
+    # Tracked until its row is committed so shutdown can remove it if the request never finishes
+    drain_state.track_upload(file_path)
     try:
         # Save file
         async with aiofiles.open(file_path, 'wb') as f:
@@ -68,8 +160,30 @@ async def upload_and_predict(
                 detail="Invalid image file"
             )
         
-        # Make prediction
-        prediction_result = ml_service.predict(file_path)
+        # Look for near-duplicates among the user's earlier uploads
+        image_hash = None
+        near_duplicates = []
+        if settings.DUPLICATE_DETECTION_ENABLED:
+            image_hash = await run_in_threadpool(perceptual_hash, file_path)
+            if image_hash:
+                near_duplicates = await run_in_threadpool(
+                    duplicate_index.search, image_hash, settings.DUPLICATE_MAX_DISTANCE, current_user.id
+                )
+        
+        prediction_result = None
+        if reuse_duplicates and near_duplicates:
+            resolved_mode = mode.value if mode else settings.DEFAULT_INFERENCE_MODE
+            prediction_result = _reusable_result(db, near_duplicates, current_user.id, resolved_mode)
+        
+        if prediction_result is None:
+            # Make prediction on the inference scheduler, off the event loop
+            prediction_result = await inference_scheduler.run(
+                _predict_with_headroom,
+                file_path,
+                dimensions,
+                mode=mode.value if mode else None,
+                priority=_resolve_priority(current_user, priority)
+            )
         
         if "error" in prediction_result:
             os.remove(file_path)
@@ -86,59 +200,250 @@ async def upload_and_predict(
             image_size=file_size,
             prediction_result=prediction_result["prediction"],
             confidence_score=prediction_result["confidence"],
-            processing_time=prediction_result["processing_time"]
+            probabilities=ml_service.encode_probabilities(prediction_result["probabilities"]),
+            processing_time=prediction_result["processing_time"],
+            model_version=prediction_result["model_version"],
+            inference_mode=prediction_result["inference_mode"],
+            image_phash=image_hash,
+            duplicate_of=prediction_result.get("duplicate_of")
         )
         
         db.add(db_prediction)
         db.commit()
+        drain_state.release_upload(file_path)
         db.refresh(db_prediction)
+        invalidate_predictions(current_user.id)
+        if image_hash:
+            duplicate_index.add(db_prediction.id, current_user.id, image_hash)
         
-        return PredictionResponse(
+        response = PredictionResponse(
             id=db_prediction.id,
             prediction=prediction_result["prediction"],
             confidence=prediction_result["confidence"],
             processing_time=prediction_result["processing_time"],
             probabilities=prediction_result["probabilities"],
+            model_version=prediction_result["model_version"],
+            inference_mode=prediction_result["inference_mode"],
             image_filename=file.filename,
+            duplicate_of=db_prediction.duplicate_of,
+            near_duplicates=[
+                DuplicateMatch(id=prediction_id, distance=distance)
+                for prediction_id, distance in near_duplicates
+            ],
             created_at=db_prediction.created_at
         )
+        await run_in_threadpool(publish_prediction_completed, current_user.id, response.model_dump(mode="json"))
         
+        return response
+        
+    except HTTPException:
+        _discard_upload(file_path)
+        raise
+    except SchedulerClosedError:
+        # Draining began while this upload was being validated
+        _discard_upload(file_path)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is shutting down, please retry",
+            headers={"Retry-After": "1", "Connection": "close"}
+        )
+    except SchedulerFullError:
+        _discard_upload(file_path)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Inference queue is full, please retry later",
+            headers={"Retry-After": "5"}
+        )
+    except MemoryPressureError:
+        _discard_upload(file_path)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is low on memory, please retry later",
+            headers={"Retry-After": "5"}
+        )
+    except asyncio.CancelledError:
+        # Cancelled at the shutdown deadline
+        _discard_upload(file_path)
+        raise
     except Exception as e:
         # Clean up file if something goes wrong
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        _discard_upload(file_path)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Processing failed: {str(e)}"
         )
+    finally:
+        drain_state.release_upload(file_path)
+
+# Columns needed to serialize a prediction; selecting them directly skips ORM hydration
+PREDICTION_COLUMNS = (
+    Prediction.id,
+    Prediction.prediction_result,
+    Prediction.confidence_score,
+    Prediction.processing_time,
+    Prediction.probabilities,
+    Prediction.model_version,
+    Prediction.inference_mode,
+    Prediction.image_filename,
+    Prediction.duplicate_of,
+    Prediction.created_at,
+)
+
+def _serialize_prediction(row) -> dict:
+    """Build a PredictionResponse-shaped dict from a PREDICTION_COLUMNS row"""
+    (prediction_id, result, confidence, processing_time, probabilities,
+     model_version, inference_mode, image_filename, duplicate_of, created_at) = row
+    
+    if probabilities is not None:
+        probabilities = ml_service.decode_probabilities(probabilities)
+    else:
+        # Rows stored before probability vectors were persisted
+        malignant = confidence if result == "Malignant" else 1 - confidence
+        probabilities = {"Benign": 1 - malignant, "Malignant": malignant}
+    
+    return {
+        "id": prediction_id,
+        "prediction": result,
+        "confidence": confidence,
+        "processing_time": processing_time,
+        "probabilities": probabilities,
+        "model_version": model_version,
+        "inference_mode": inference_mode,
+        "image_filename": image_filename,
+        "duplicate_of": duplicate_of,
+        "created_at": created_at,
+    }
 
 @router.get("/history", response_model=List[PredictionResponse])
 def get_prediction_history(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get prediction history for the current user"""
-    predictions = db.query(Prediction).filter(
-        Prediction.user_id == current_user.id
-    ).offset(skip).limit(limit).all()
-    
-    return [
-        PredictionResponse(
-            id=pred.id,
-            prediction=pred.prediction_result,
-            confidence=pred.confidence_score,
-            processing_time=pred.processing_time,
-            probabilities={
-                "Benign": 1 - pred.confidence_score if pred.prediction_result == "Malignant" else pred.confidence_score,
-                "Malignant": pred.confidence_score if pred.prediction_result == "Malignant" else 1 - pred.confidence_score
-            },
-            image_filename=pred.image_filename,
-            created_at=pred.created_at
-        )
-        for pred in predictions
-    ]
+    def build() -> bytes:
+        rows = db.execute(
+            select(*PREDICTION_COLUMNS)
+            .where(Prediction.user_id == current_user.id)
+            .offset(skip)
+            .limit(limit)
+        ).all()
+        return orjson.dumps([_serialize_prediction(row) for row in rows])
+    
+    return cached_json_response(
+        request,
+        f"user:{current_user.id}",
+        prediction_data_version(db, current_user.id),
+        build
+    )
+
+EXPORT_CSV_FIELDS = [
+    "id", "user_id", "prediction", "confidence", "processing_time",
+    *(f"probability_{label}" for label in ml_service.class_labels.values()),
+    "model_version", "inference_mode", "image_filename", "duplicate_of", "created_at",
+]
+
+def _encode_ndjson(rows) -> bytes:
+    return b"".join(
+        orjson.dumps(dict(_serialize_prediction(row[1:]), user_id=row[0])) + b"\n"
+        for row in rows
+    )
+
+def _encode_csv(rows, include_header: bool) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if include_header:
+        writer.writerow(EXPORT_CSV_FIELDS)
+    for row in rows:
+        prediction = _serialize_prediction(row[1:])
+        writer.writerow([
+            prediction["id"], row[0], prediction["prediction"], prediction["confidence"],
+            prediction["processing_time"],
+            *(prediction["probabilities"].get(label) for label in ml_service.class_labels.values()),
+            prediction["model_version"], prediction["inference_mode"], prediction["image_filename"],
+            prediction["duplicate_of"], prediction["created_at"].isoformat() if prediction["created_at"] else None,
+        ])
+    return buffer.getvalue().encode()
+
+def _stream_export(query, export_format: ExportFormat, compress: bool):
+    """
+    Yield encoded export chunks, one per cursor batch.
+    
+    Uses its own session and a server-side cursor (yield_per), so only one
+    batch of rows is held in memory regardless of the result size.
+    """
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16) if compress else None
+    db = SessionLocal()
+    try:
+        result = db.execute(query.execution_options(yield_per=settings.EXPORT_BATCH_SIZE))
+        first = True
+        for rows in result.partitions():
+            if export_format == ExportFormat.csv:
+                chunk = _encode_csv(rows, include_header=first)
+            else:
+                chunk = _encode_ndjson(rows)
+            first = False
+            if compressor:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+        if export_format == ExportFormat.csv and first:
+            # Empty result: still emit the header row
+            chunk = _encode_csv([], include_header=True)
+            yield compressor.compress(chunk) if compressor else chunk
+        if compressor:
+            yield compressor.flush()
+    finally:
+        db.close()
+
+@router.get("/export")
+def export_predictions(
+    export_format: ExportFormat = Query(ExportFormat.ndjson, alias="format"),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    prediction_class: Optional[str] = None,
+    all_users: bool = False,
+    compress: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    """Stream predictions as NDJSON or CSV, optionally gzip-compressed"""
+    if all_users and not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Exporting all users' predictions requires admin privileges"
+        )
+    
+    if prediction_class is not None and prediction_class not in ml_service.class_labels.values():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown prediction class. Allowed: {', '.join(ml_service.class_labels.values())}"
+        )
+    
+    query = select(Prediction.user_id, *PREDICTION_COLUMNS).order_by(Prediction.id)
+    if not all_users:
+        query = query.where(Prediction.user_id == current_user.id)
+    if start_date is not None:
+        query = query.where(Prediction.created_at >= start_date)
+    if end_date is not None:
+        query = query.where(Prediction.created_at < end_date)
+    if prediction_class is not None:
+        query = query.where(Prediction.prediction_result == prediction_class)
+    
+    if export_format == ExportFormat.csv:
+        media_type, extension = "text/csv", "csv"
+    else:
+        media_type, extension = "application/x-ndjson", "ndjson"
+    if compress:
+        media_type, extension = "application/gzip", f"{extension}.gz"
+    
+    filename = f"predictions_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{extension}"
+    return StreamingResponse(
+        _stream_export(query, export_format, compress),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 @router.get("/{prediction_id}", response_model=PredictionResponse)
 def get_prediction(
@@ -147,9 +452,34 @@ def get_prediction(
     current_user: User = Depends(get_current_user)
 ):
     """Get a specific prediction by ID"""
-    prediction = db.query(Prediction).filter(
-        Prediction.id == prediction_id,
-        Prediction.user_id == current_user.id
+    row = db.execute(
+        select(*PREDICTION_COLUMNS).where(
+            Prediction.id == prediction_id,
+            Prediction.user_id == current_user.id
+        )
+    ).first()
+    
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Prediction not found"
+        )
+    
+    return ORJSONResponse(_serialize_prediction(row))
+
+@router.get("/{prediction_id}/duplicates", response_model=List[NearDuplicateResponse])
+def get_near_duplicates(
+    prediction_id: int,
+    max_distance: int = Query(settings.DUPLICATE_MAX_DISTANCE, ge=0, le=15, description="Maximum differing hash bits"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get the current user's earlier predictions for near-identical images"""
+    prediction = db.execute(
+        select(Prediction.image_phash, Prediction.image_path).where(
+            Prediction.id == prediction_id,
+            Prediction.user_id == current_user.id
+        )
     ).first()
     
     if not prediction:
@@ -158,15 +488,106 @@ def get_prediction(
             detail="Prediction not found"
         )
     
-    return PredictionResponse(
-        id=prediction.id,
-        prediction=prediction.prediction_result,
-        confidence=prediction.confidence_score,
-        processing_time=prediction.processing_time,
-        probabilities={
-            "Benign": 1 - prediction.confidence_score if prediction.prediction_result == "Malignant" else prediction.confidence_score,
-            "Malignant": prediction.confidence_score if prediction.prediction_result == "Malignant" else 1 - prediction.confidence_score
-        },
-        image_filename=prediction.image_filename,
-        created_at=prediction.created_at
+    # Predictions stored before hashing was added are hashed on demand
+    image_hash = prediction.image_phash or perceptual_hash(prediction.image_path)
+    if not image_hash:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Image for this prediction is no longer available"
+        )
+    
+    matches = duplicate_index.search(image_hash, max_distance, current_user.id, exclude_id=prediction_id)
+    if not matches:
+        return ORJSONResponse([])
+    
+    rows = {
+        row.id: row
+        for row in db.execute(
+            select(*PREDICTION_COLUMNS).where(Prediction.id.in_([match_id for match_id, _ in matches]))
+        ).all()
+    }
+    return ORJSONResponse([
+        {"distance": distance, "prediction": _serialize_prediction(rows[match_id])}
+        for match_id, distance in matches
+        if match_id in rows
+    ])
+
+@router.get(
+    "/{prediction_id}/explanation",
+    dependencies=[Depends(accepting_work)],
+    response_class=Response,
+    responses={200: {"content": {"image/png": {}}, "description": "Saliency heatmap over the scan"}}
+)
+async def get_prediction_explanation(
+    prediction_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get a saliency heatmap showing which regions drove a prediction, as a PNG overlay"""
+    prediction = db.execute(
+        select(Prediction.image_path, Prediction.prediction_result, Prediction.model_version).where(
+            Prediction.id == prediction_id,
+            Prediction.user_id == current_user.id
+        )
+    ).first()
+    
+    if not prediction:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Prediction not found"
+        )
+    
+    # Archived images are gzipped out of UPLOAD_DIR (see jobs/reconcile_uploads) and kept for records only
+    archived = (
+        not prediction.image_path.startswith(os.path.join(settings.UPLOAD_DIR, ""))
+        or prediction.image_path.endswith(".gz")
+    )
+    if archived or not os.path.exists(prediction.image_path):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Image for this prediction has been archived" if archived
+            else "Image for this prediction is no longer available"
+        )
+    
+    # Explain with the model that made the prediction while it is still loaded
+    model_version = prediction.model_version
+    try:
+        ml_service.registry.get(model_version)
+    except KeyError:
+        model_version = ml_service.model_version
+    
+    cache_path, png = await run_in_threadpool(
+        cached_explanation, prediction.image_path, prediction.prediction_result, model_version
+    )
+    if png is None:
+        try:
+            await asyncio.wait_for(explain_semaphore.acquire(), settings.EXPLAIN_QUEUE_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Explanation capacity is busy, please retry later",
+                headers={"Retry-After": "10"}
+            )
+        try:
+            dimensions = await run_in_threadpool(ml_service.image_dimensions, prediction.image_path)
+            with memory_governor.reserve(estimate_image_memory(*(dimensions or (0, 0)))):
+                png = await run_in_threadpool(
+                    compute_explanation, prediction.image_path, prediction.prediction_result, model_version, cache_path
+                )
+        except MemoryPressureError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is low on memory, please retry later",
+                headers={"Retry-After": "10"}
+            )
+        finally:
+            explain_semaphore.release()
+    
+    return Response(
+        content=png,
+        media_type="image/png",
+        headers={
+            "Cache-Control": "private, max-age=86400",
+            "X-Model-Version": model_version,
+        }
     )
\ No newline at end of file
@@ -14,6 +14,24 @@ class Settings(BaseSettings):
     # Redis
     REDIS_URL: str = "redis://localhost:6379"
     
+    # Rate limiting (token buckets: sustained rate per minute, burst capacity)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_INFERENCE_PER_MINUTE: int = 10
+    RATE_LIMIT_INFERENCE_BURST: int = 5
+    RATE_LIMIT_GLOBAL_INFERENCE_PER_MINUTE: int = 600
+    RATE_LIMIT_GLOBAL_INFERENCE_BURST: int = 60
+    RATE_LIMIT_READ_PER_MINUTE: int = 100
+    RATE_LIMIT_READ_BURST: int = 50
+    RATE_LIMIT_REDIS_RETRY_SECONDS: int = 30
+    
+    # HTTP caching of read-only endpoints (ETag/304 plus serialized bodies in Redis)
+    HTTP_CACHE_ENABLED: bool = True
+    HTTP_CACHE_TTL_SECONDS: int = 300
+    HTTP_CACHE_ROLLUP_SECONDS: int = 60  # max staleness of time-windowed dashboard counts
+    HTTP_CACHE_MAX_BODY_BYTES: int = 1024 * 1024  # larger bodies are not stored in Redis
+    HTTP_CACHE_REDIS_RETRY_SECONDS: int = 30
+    HTTP_COMPRESSION_MIN_BYTES: int = 1024
+    
     # Security
     SECRET_KEY: str = "your-super-secret-key-change-this-in-production"
     JWT_SECRET_KEY: str = "your-jwt-secret-key-change-this-in-production"
@@ -24,11 +42,80 @@ class Settings(BaseSettings):
     MODEL_PATH: str = "/app/models/cnn_rnn_model_1.h5"
     MODEL_INPUT_SIZE: int = 64
     MODEL_SEQUENCE_LENGTH: int = 10
+    MODEL_VERSION: str = "v1"
+    MODEL_DIR: str = "/app/models"
+    MODEL_REGISTRY_MAX_VERSIONS: int = 3
+    DEFAULT_INFERENCE_MODE: str = "fast"  # "fast" or "augmented" (test-time augmentation)
+    
+    # Inference scheduling
+    INFERENCE_WORKERS: int = 1
+    INFERENCE_BULK_MIN_SHARE: float = 0.2  # share of dispatches reserved for waiting bulk jobs
+    INFERENCE_MAX_QUEUED: int = 256  # per priority class
+    INFERENCE_BULK_ROLES: List[str] = ["integration"]  # roles whose uploads default to bulk priority
+    
+    # Inference runtime (thread pools and CPU placement)
+    TF_INTER_OP_THREADS: int = 0  # 0 lets TensorFlow pick (one per core; 1 per replica)
+    TF_INTRA_OP_THREADS: int = 0  # 0 lets TensorFlow pick (one per core; the replica's cores)
+    THREADPOOL_WORKERS: int = 0  # threads for sync endpoints and run_in_threadpool; 0 keeps anyio's 40
+    INFERENCE_REPLICAS: int = 0  # model replica processes, each pinned to its own cores; 0 runs in-process
+    INFERENCE_REPLICA_CPUS: Optional[str] = None  # e.g. "0-3;4-7"; default splits cores by NUMA node
+    
+    # Memory governance (RSS-based admission control)
+    MEMORY_LIMIT_MB: int = 0  # 0 uses the container's cgroup limit, if any
+    MEMORY_ADMISSION_THRESHOLD: float = 0.85  # share of the limit new work may fill
+    MEMORY_INFERENCE_OVERHEAD_MB: int = 64  # working set of one inference besides the decoded image
+    
+    # Shadow / canary rollout of candidate model versions
+    SHADOW_MODEL_VERSION: Optional[str] = None
+    SHADOW_SAMPLE_RATE: float = 0.0  # fraction of requests mirrored to the shadow model
+    SHADOW_MAX_PENDING: int = 16
+    CANARY_MODEL_VERSION: Optional[str] = None
+    CANARY_TRAFFIC_PERCENT: float = 0.0
+    CANARY_WINDOW: int = 200
+    CANARY_MIN_REQUESTS: int = 20
+    CANARY_MAX_ERROR_RATE: float = 0.05
+    CANARY_MAX_P95_LATENCY_MS: float = 2000.0
     
     # File Upload
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
     ALLOWED_EXTENSIONS: List[str] = ["jpg", "jpeg", "png", "bmp", "tiff"]
+    MAX_DECODED_PIXELS: int = 50_000_000  # width x height, checked from the header before decoding
     UPLOAD_DIR: str = "uploads"
+    UPLOAD_QUARANTINE_DIR: str = "uploads_quarantine"  # orphaned uploads, see app.jobs.reconcile_uploads
+    UPLOAD_ARCHIVE_DIR: str = "uploads_archive"  # gzipped cold storage for old originals
+    
+    # Saliency explanations
+    EXPLAIN_SAMPLES: int = 8  # SmoothGrad batch size, one gradient pass
+    EXPLAIN_NOISE: float = 0.1
+    EXPLAIN_MAX_CONCURRENCY: int = 1  # explanations computed at once per worker
+    EXPLAIN_QUEUE_TIMEOUT_SECONDS: int = 10  # wait for a slot before answering 503
+    EXPLAIN_CACHE_DIR: str = "explanations"
+    EXPLAIN_OVERLAY_MAX_SIZE: int = 512  # longest side of the returned PNG
+    
+    # Near-duplicate detection (Hamming distance between 64-bit perceptual hashes)
+    DUPLICATE_DETECTION_ENABLED: bool = True
+    DUPLICATE_MAX_DISTANCE: int = 8  # reported as near-duplicates
+    DUPLICATE_REUSE_MAX_DISTANCE: int = 2  # close enough to reuse the earlier result when asked
+    DUPLICATE_INDEX_REFRESH_SECONDS: int = 300  # full reload, picks up backfilled hashes
+    
+    # Server-sent events
+    EVENTS_BROKER: str = "redis"  # "redis" (pub/sub across workers) or "memory" (single process)
+    EVENTS_HEARTBEAT_SECONDS: int = 15
+    EVENTS_REPLAY_SIZE: int = 500  # events kept per channel for Last-Event-ID reconnects
+    EVENTS_SUBSCRIBER_QUEUE: int = 100  # a subscriber this far behind is disconnected
+    EVENTS_MAX_SUBSCRIBERS: int = 5000  # open streams per worker
+    EVENTS_REDIS_RETRY_SECONDS: int = 30  # events are dropped for this long after a Redis failure
+    
+    # Graceful shutdown
+    SHUTDOWN_DRAIN_SECONDS: float = 10.0  # wait for queued/running inference after requests finish
+    
+    # Export
+    EXPORT_BATCH_SIZE: int = 2000  # rows fetched per server-side cursor round trip
+    
+    # Profiling
+    PROFILING_ENABLED: bool = False
+    PROFILING_HEADER: str = "X-Profile"
+    PROFILING_OUTPUT_DIR: str = "profiles"
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,199 @@
+import gzip
+import hashlib
+import time
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+import redis
+from redis.exceptions import RedisError
+from fastapi import Request, Response
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.models import Prediction, User
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Preferred first when the client accepts several
+ENCODERS: Dict[str, Callable[[bytes], bytes]] = {}
+if brotli is not None:
+    ENCODERS["br"] = lambda body: brotli.compress(body, quality=5)
+ENCODERS["gzip"] = lambda body: gzip.compress(body, compresslevel=6)
+
+class ResponseCache:
+    """
+    Serialized response bodies in Redis, one hash per scope.
+
+    A scope is "global" or "user:<id>"; each field holds the ETag and the
+    encoded variants of one URL. Entries are only served when their ETag
+    matches the current data version, and writes that change a scope drop
+    its hash outright. When Redis is unreachable the cache is bypassed
+    until a cool-down passes.
+    """
+
+    def __init__(self):
+        self._redis = redis.Redis.from_url(
+            settings.REDIS_URL,
+            socket_connect_timeout=0.25,
+            socket_timeout=0.25
+        )
+        self._redis_retry_at = 0.0
+
+    def _available(self) -> bool:
+        return settings.HTTP_CACHE_ENABLED and time.monotonic() >= self._redis_retry_at
+
+    def _disable(self, e: Exception):
+        logger.warning(f"Response cache unavailable, bypassing it: {e}")
+        self._redis_retry_at = time.monotonic() + settings.HTTP_CACHE_REDIS_RETRY_SECONDS
+
+    def get(self, scope: str, field: str, etag: str, encoding: str) -> Optional[Tuple[str, bytes]]:
+        """
+        Return (encoding, body) for field if the cached entry is still current.
+        Falls back to the uncompressed body when the encoding was not cached.
+        """
+        if not self._available():
+            return None
+        try:
+            cached_etag, encoded, identity = self._redis.hmget(
+                f"httpcache:{scope}", f"{field}|etag", f"{field}|{encoding}", f"{field}|identity"
+            )
+        except (RedisError, OSError) as e:
+            self._disable(e)
+            return None
+        if cached_etag is None or cached_etag.decode() != etag:
+            return None
+        if encoded is not None:
+            return encoding, encoded
+        return ("identity", identity) if identity is not None else None
+
+    def set(self, scope: str, field: str, etag: str, variants: Dict[str, bytes]):
+        if not self._available():
+            return
+        mapping = {f"{field}|{encoding}": body for encoding, body in variants.items()}
+        mapping[f"{field}|etag"] = etag
+        try:
+            pipe = self._redis.pipeline(transaction=False)
+            pipe.hset(f"httpcache:{scope}", mapping=mapping)
+            pipe.expire(f"httpcache:{scope}", settings.HTTP_CACHE_TTL_SECONDS)
+            pipe.execute()
+        except (RedisError, OSError) as e:
+            self._disable(e)
+
+    def invalidate(self, *scopes: str):
+        """Drop every cached response in the given scopes"""
+        if not self._available():
+            return
+        try:
+            self._redis.delete(*(f"httpcache:{scope}" for scope in scopes))
+        except (RedisError, OSError) as e:
+            self._disable(e)
+
+response_cache = ResponseCache()
+
+def invalidate_predictions(user_id: int):
+    """Call after predictions for user_id change; also drops the global dashboard"""
+    response_cache.invalidate("global", f"user:{user_id}")
+
+def prediction_data_version(db: Session, user_id: Optional[int] = None) -> str:
+    """Latest prediction id and row count, for all predictions or one user's"""
+    query = db.query(func.max(Prediction.id), func.count(Prediction.id))
+    if user_id is not None:
+        query = query.filter(Prediction.user_id == user_id)
+    latest_id, count = query.one()
+    return f"p{latest_id or 0}.{count}"
+
+def dashboard_data_version(db: Session) -> str:
+    """
+    Data version for the global dashboard: predictions, users, and a rollup
+    bucket so time-windowed counts ("last 7 days") are recomputed at least
+    every HTTP_CACHE_ROLLUP_SECONDS.
+    """
+    latest_user_id, user_count = db.query(func.max(User.id), func.count(User.id)).one()
+    rollup = int(time.time() // settings.HTTP_CACHE_ROLLUP_SECONDS)
+    return f"{prediction_data_version(db)}.u{latest_user_id or 0}.{user_count}.r{rollup}"
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    tags: List[str] = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison: W/"x" and "x" refer to the same representation
+    return "*" in tags or any(tag.removeprefix("W/") == etag.removeprefix("W/") for tag in tags)
+
+def _negotiate_encoding(accept_encoding: str) -> str:
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        name, _, value = params.strip().partition("=")
+        try:
+            if name.strip() == "q" and float(value) == 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(coding.strip().lower())
+    for encoding in ENCODERS:
+        if encoding in accepted:
+            return encoding
+    return "identity"
+
+def cached_json_response(
+    request: Request,
+    scope: str,
+    data_version: str,
+    build: Callable[[], bytes]
+) -> Response:
+    """
+    Serve a JSON body with an ETag derived from data_version.
+
+    Answers 304 when the client already has the current version, otherwise
+    serves the body from the response cache, or calls build() to serialize
+    it and caches the result. Bodies over HTTP_COMPRESSION_MIN_BYTES are
+    gzip (or brotli, when installed) compressed for clients that accept it.
+
+    Args:
+        request: The incoming request; its path and query key the cache entry
+        scope: "global" or "user:<id>", matching invalidate_predictions
+        data_version: Changes whenever the response content would change
+        build: Returns the serialized JSON body
+
+    Returns:
+        A 304 or 200 Response with ETag, Cache-Control and Vary headers
+    """
+    field = f"{request.url.path}?{request.url.query}"
+    digest = hashlib.sha1(f"{scope}|{field}|{data_version}".encode()).hexdigest()[:20]
+    etag = f'W/"{digest}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, no-cache",
+        "Vary": "Accept-Encoding, Authorization",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    encoding = _negotiate_encoding(request.headers.get("accept-encoding", ""))
+    cached = response_cache.get(scope, field, etag, encoding)
+    if cached is not None:
+        cached_encoding, body = cached
+        if cached_encoding != encoding and len(body) >= settings.HTTP_COMPRESSION_MIN_BYTES:
+            body = ENCODERS[encoding](body)
+        else:
+            encoding = cached_encoding
+    else:
+        raw = build()
+        variants = {"identity": raw}
+        if encoding != "identity" and len(raw) >= settings.HTTP_COMPRESSION_MIN_BYTES:
+            variants[encoding] = ENCODERS[encoding](raw)
+        if len(raw) <= settings.HTTP_CACHE_MAX_BODY_BYTES:
+            response_cache.set(scope, field, etag, variants)
+        # Small bodies have no compressed variant and are sent as-is
+        encoding = encoding if encoding in variants else "identity"
+        body = variants[encoding]
+
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
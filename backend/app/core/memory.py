@@ -0,0 +1,185 @@
+import itertools
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+MB = 1024 * 1024
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+# Limits at or above this are cgroup v1's way of saying "unlimited"
+_CGROUP_UNLIMITED = 1 << 60
+
+# How often RSS is sampled while a stage is running
+STAGE_SAMPLE_SECONDS = 0.005
+
+class MemoryPressureError(Exception):
+    """Raised when admitting more work would push RSS past the memory limit"""
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        # No procfs (e.g. macOS): fall back to the lifetime peak
+        return peak_rss()
+
+def peak_rss() -> int:
+    """Highest RSS this process has reached, in bytes"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and kilobytes on Linux
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def container_memory_limit() -> Optional[int]:
+    """The cgroup memory limit in bytes, or None if unlimited or unknown"""
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value == "max":
+            return None
+        limit = int(value)
+        return limit if limit < _CGROUP_UNLIMITED else None
+    return None
+
+class MemoryGovernor:
+    """
+    RSS-based admission control and per-stage memory high-water marks.
+
+    Work reserves an estimate of the memory it will need before it starts.
+    It is admitted while current RSS plus all outstanding reservations stays
+    under MEMORY_ADMISSION_THRESHOLD of the limit, so a burst of large
+    uploads is turned away with 503 instead of taking the worker past its
+    container limit. One reservation is always admitted when nothing else
+    is in flight, so a high baseline cannot block the worker entirely.
+
+    Stage marks record the highest RSS seen while a stage runs: a sampler
+    thread reads RSS every STAGE_SAMPLE_SECONDS while any stage is active,
+    so a transient peak inside a stage (e.g. a full decode before the
+    resize) is caught, not just RSS at its start and end. RSS is
+    process-wide, so with concurrent requests a stage's peak includes
+    whatever else ran alongside.
+    """
+
+    def __init__(self, limit_bytes: Optional[int], threshold: float):
+        self._limit = limit_bytes
+        self._threshold = threshold
+        self._lock = threading.Lock()
+        self._reserved = 0
+        self._in_flight = 0
+        self._rejected = 0
+        self._stages: Dict[str, Dict] = {}
+        self._active: Dict[int, List[int]] = {}  # running stage -> [highest RSS seen]
+        self._stage_ids = itertools.count()
+        self._stage_started = threading.Condition(self._lock)
+        self._sampler: Optional[threading.Thread] = None
+
+    @property
+    def limit(self) -> Optional[int]:
+        return self._limit
+
+    @contextmanager
+    def reserve(self, nbytes: int):
+        """Hold nbytes of headroom for the duration of the block, or raise MemoryPressureError"""
+        with self._lock:
+            if self._limit and self._in_flight:
+                rss = current_rss()
+                if rss + self._reserved + nbytes > self._limit * self._threshold:
+                    self._rejected += 1
+                    raise MemoryPressureError(
+                        f"RSS {rss / MB:.0f}MB with {self._reserved / MB:.0f}MB reserved; "
+                        f"{nbytes / MB:.0f}MB more would exceed {self._threshold:.0%} of {self._limit / MB:.0f}MB"
+                    )
+            self._reserved += nbytes
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._reserved -= nbytes
+                self._in_flight -= 1
+
+    @contextmanager
+    def stage(self, name: str):
+        """Record the peak RSS and time of a processing stage"""
+        started_rss = current_rss()
+        peak = [started_rss]
+        with self._lock:
+            stage_id = next(self._stage_ids)
+            self._active[stage_id] = peak
+            if self._sampler is None:
+                # Started on first use so importing the module spawns no threads
+                self._sampler = threading.Thread(target=self._sample, name="memory-stage-sampler", daemon=True)
+                self._sampler.start()
+            self._stage_started.notify()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            ended_rss = current_rss()
+            with self._lock:
+                del self._active[stage_id]
+                high = max(peak[0], ended_rss)
+                marks = self._stages.setdefault(name, {
+                    "count": 0, "max_rss": 0, "max_growth": 0, "last_rss": 0, "max_seconds": 0.0
+                })
+                marks["count"] += 1
+                marks["max_rss"] = max(marks["max_rss"], high)
+                marks["max_growth"] = max(marks["max_growth"], high - started_rss)
+                marks["last_rss"] = ended_rss
+                marks["max_seconds"] = max(marks["max_seconds"], time.perf_counter() - started)
+
+    def _sample(self):
+        """Raise the peak of every running stage to the current RSS until none are running"""
+        while True:
+            with self._lock:
+                self._stage_started.wait_for(lambda: self._active)
+            rss = current_rss()
+            with self._lock:
+                for peak in self._active.values():
+                    if rss > peak[0]:
+                        peak[0] = rss
+            time.sleep(STAGE_SAMPLE_SECONDS)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "rss_mb": round(current_rss() / MB, 1),
+                "peak_rss_mb": round(peak_rss() / MB, 1),
+                "limit_mb": round(self._limit / MB, 1) if self._limit else None,
+                "admission_threshold": self._threshold,
+                "reserved_mb": round(self._reserved / MB, 1),
+                "in_flight": self._in_flight,
+                "rejected": self._rejected,
+                "stages": {
+                    name: {
+                        "count": marks["count"],
+                        "max_rss_mb": round(marks["max_rss"] / MB, 1),
+                        "max_growth_mb": round(marks["max_growth"] / MB, 1),
+                        "last_rss_mb": round(marks["last_rss"] / MB, 1),
+                        "max_seconds": round(marks["max_seconds"], 3),
+                    }
+                    for name, marks in self._stages.items()
+                },
+            }
+
+def estimate_image_memory(width: int, height: int) -> int:
+    """
+    Bytes needed to run one image: the decoded frame and its RGB conversion
+    (PIL keeps both at 4 bytes per pixel) plus the model's working set.
+    """
+    return width * height * 4 * 2 + settings.MEMORY_INFERENCE_OVERHEAD_MB * MB
+
+memory_governor = MemoryGovernor(
+    limit_bytes=settings.MEMORY_LIMIT_MB * MB if settings.MEMORY_LIMIT_MB else container_memory_limit(),
+    threshold=settings.MEMORY_ADMISSION_THRESHOLD
+)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Additive schema upgrades for databases created before a column existed.
+
+Base.metadata.create_all only creates missing tables; it never alters a
+table that is already there. Columns added to existing models are listed
+in ADDED_COLUMNS and added at startup with ALTER TABLE ... ADD COLUMN when
+the database does not have them yet. Indexes declared on those columns, and
+on the existing columns in INDEXED_COLUMNS, are created with CREATE INDEX
+IF NOT EXISTS. Every step checks first, so running it again is a no-op.
+
+Runs from app.main on startup; to upgrade a database before deploying:
+    python -m app.core.migrations
+"""
+
+import logging
+import sys
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Column, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateIndex
+
+from app.core.database import engine
+from app.models.models import Prediction, User
+
+logger = logging.getLogger(__name__)
+
+# (model column, SQL default for rows that already exist); append new columns at the end
+ADDED_COLUMNS: List[Tuple[Column, Optional[str]]] = [
+    (Prediction.__table__.c.model_version, None),
+    (Prediction.__table__.c.inference_mode, None),
+    (Prediction.__table__.c.probabilities, None),
+    (User.__table__.c.role, "'clinician'"),
+    (Prediction.__table__.c.image_phash, None),
+    (Prediction.__table__.c.duplicate_of, None),
+]
+
+# Columns that existed from the start but have since been declared with index=True
+INDEXED_COLUMNS: List[Column] = [
+    Prediction.__table__.c.user_id,  # per-user history and ETag version queries
+    Prediction.__table__.c.image_path,  # reconcile_uploads lookups
+]
+
+def _column_ddl(column: Column, bind: Engine, default: Optional[str]) -> str:
+    preparer = bind.dialect.identifier_preparer
+    ddl = f"{preparer.quote(column.name)} {column.type.compile(dialect=bind.dialect)}"
+    for fk in column.foreign_keys:
+        ddl += f" REFERENCES {preparer.quote(fk.column.table.name)} ({preparer.quote(fk.column.name)})"
+    if default is not None:
+        ddl += f" DEFAULT {default}"
+    return ddl
+
+def upgrade_schema(bind: Engine = engine) -> List[str]:
+    """Add missing columns from ADDED_COLUMNS and missing indexes; returns the columns added"""
+    inspector = inspect(bind)
+    existing = {}
+    added = []
+    with bind.begin() as conn:
+        for column, default in ADDED_COLUMNS:
+            table = column.table
+            if not inspector.has_table(table.name):
+                continue  # create_all builds new tables whole
+            if table.name not in existing:
+                existing[table.name] = {c["name"] for c in inspector.get_columns(table.name)}
+            if column.name not in existing[table.name]:
+                conn.execute(text(
+                    f"ALTER TABLE {bind.dialect.identifier_preparer.quote(table.name)} "
+                    f"ADD COLUMN {_column_ddl(column, bind, default)}"
+                ))
+                existing[table.name].add(column.name)
+                added.append(f"{table.name}.{column.name}")
+
+        for column in [column for column, _ in ADDED_COLUMNS] + INDEXED_COLUMNS:
+            if not inspector.has_table(column.table.name):
+                continue
+            for index in column.table.indexes:
+                if column.name in index.columns:
+                    conn.execute(CreateIndex(index, if_not_exists=True))
+    for name in added:
+        logger.info(f"Added column {name}")
+    return added
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    added = upgrade_schema()
+    print(f"Added {len(added)} columns: {', '.join(added)}" if added else "Schema is up to date")
+    sys.exit(0)
@@ -0,0 +1,131 @@
+import cProfile
+import os
+import pstats
+import re
+import threading
+import time
+import uuid
+import logging
+from contextvars import ContextVar
+from typing import List, Optional
+
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+
+from app.api.deps import authenticate_token
+from app.core.config import settings
+from app.core.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Profiles collected on worker threads for the request being profiled, if any
+_worker_profiles: ContextVar[Optional[List[cProfile.Profile]]] = ContextVar("worker_profiles", default=None)
+
+# Held by the request being profiled. Profilers hook the whole event loop thread,
+# so a second profiled request would replace the first one's hook.
+_profiling_slot = threading.Lock()
+
+def run_profiled(func, *args, **kwargs):
+    """
+    Run func, adding its profile to the current request's cProfile report
+    when that request is being profiled. Used by the inference scheduler,
+    whose worker threads are invisible to the request's own profiler.
+    """
+    profiles = _worker_profiles.get()
+    if profiles is None:
+        return func(*args, **kwargs)
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        profiles.append(profiler)
+
+def _is_superuser(request: Request) -> bool:
+    """Whether the request carries a bearer token for a superuser"""
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    db = SessionLocal()
+    try:
+        return authenticate_token(db, token).is_superuser
+    except HTTPException:
+        return False
+    finally:
+        db.close()
+
+def _report_name(request: Request, extension: str) -> str:
+    """Build a unique, filesystem-safe report name for a request"""
+    path = re.sub(r"[^A-Za-z0-9]+", "_", request.url.path).strip("_") or "root"
+    timestamp = time.strftime("%Y%m%d-%H%M%S")
+    return f"{timestamp}_{request.method.lower()}_{path}_{uuid.uuid4().hex[:8]}.{extension}"
+
+async def profiling_middleware(request: Request, call_next):
+    """
+    Profile a single request when it carries the profiling header.
+
+    The header value selects the profiler: "pyinstrument" writes an HTML
+    report (if pyinstrument is installed), anything else writes a cProfile
+    ".prof" file that can be opened with snakeviz or pstats.
+
+    Only superusers can request a profile, and only one request per worker
+    is profiled at a time; others carrying the header are served without
+    a profile. cProfile reports cover the event loop thread plus any
+    inference jobs the request ran on the scheduler (see run_profiled), so
+    other requests' coroutines running meanwhile are charged to the report;
+    pyinstrument's async mode attributes time to the profiled request only.
+    Sync endpoints run in the threadpool and show up as time spent awaiting
+    the threadpool.
+    """
+    profiler_name = request.headers.get(settings.PROFILING_HEADER)
+    if not settings.PROFILING_ENABLED or not profiler_name:
+        return await call_next(request)
+
+    if not await run_in_threadpool(_is_superuser, request):
+        logger.warning(f"Ignoring profiling header on {request.method} {request.url.path}: superuser token required")
+        return await call_next(request)
+    if not _profiling_slot.acquire(blocking=False):
+        logger.info(f"Not profiling {request.method} {request.url.path}: another request is being profiled")
+        return await call_next(request)
+    try:
+        return await _profile_request(request, call_next, profiler_name)
+    finally:
+        _profiling_slot.release()
+
+async def _profile_request(request: Request, call_next, profiler_name: str):
+    os.makedirs(settings.PROFILING_OUTPUT_DIR, exist_ok=True)
+
+    if profiler_name.lower() == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            logger.warning("pyinstrument is not installed, falling back to cProfile")
+        else:
+            profiler = Profiler(async_mode="enabled")
+            profiler.start()
+            try:
+                response = await call_next(request)
+            finally:
+                profiler.stop()
+            report_name = _report_name(request, "html")
+            with open(os.path.join(settings.PROFILING_OUTPUT_DIR, report_name), "w") as f:
+                f.write(profiler.output_html())
+            response.headers["X-Profile-Report"] = report_name
+            return response
+
+    worker_profiles: List[cProfile.Profile] = []
+    token = _worker_profiles.set(worker_profiles)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        response = await call_next(request)
+    finally:
+        profiler.disable()
+        _worker_profiles.reset(token)
+    report_name = _report_name(request, "prof")
+    stats = pstats.Stats(profiler)
+    for worker_profile in worker_profiles:
+        stats.add(worker_profile)
+    stats.dump_stats(os.path.join(settings.PROFILING_OUTPUT_DIR, report_name))
+    logger.info(f"Profile for {request.method} {request.url.path} written to {report_name}")
+    response.headers["X-Profile-Report"] = report_name
+    return response
@@ -0,0 +1,192 @@
+import math
+import re
+import threading
+import time
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from jose import JWTError, jwt
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Routes that run the model; everything else under the API prefix is a cheap read
+INFERENCE_ROUTES = {
+    ("POST", f"{settings.API_V1_STR}/predictions/upload"),
+}
+INFERENCE_ROUTE_PATTERNS = [
+    ("GET", re.compile(rf"{re.escape(settings.API_V1_STR)}/predictions/\d+/explanation")),
+]
+
+# Refill every bucket and take one token from each only if all of them have one.
+# KEYS: bucket keys. ARGV: capacity and refill rate (tokens/second) per key.
+# Returns {allowed, seconds until retry}. Uses the Redis clock so workers agree on time.
+TOKEN_BUCKET_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local tokens = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[2 * i - 1])
+    local rate = tonumber(ARGV[2 * i])
+    local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+    local available = tonumber(bucket[1]) or capacity
+    local last = tonumber(bucket[2]) or now
+    available = math.min(capacity, available + math.max(0, now - last) * rate)
+    tokens[i] = available
+    if available < 1 then
+        wait = math.max(wait, (1 - available) / rate)
+    end
+end
+local allowed = 0
+if wait == 0 then
+    allowed = 1
+end
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[2 * i - 1])
+    local rate = tonumber(ARGV[2 * i])
+    redis.call('HSET', key, 'tokens', tokens[i] - allowed, 'ts', now)
+    redis.call('EXPIRE', key, math.ceil(capacity / rate) + 1)
+end
+return {allowed, tostring(wait)}
+"""
+
+# (key, capacity, refill rate in tokens/second)
+Bucket = Tuple[str, float, float]
+
+class LocalTokenBuckets:
+    """In-process token buckets used when Redis is not reachable"""
+
+    def __init__(self, max_keys: int = 10000):
+        self._buckets: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        self._max_keys = max_keys
+
+    def acquire(self, buckets: List[Bucket]) -> Tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            if len(self._buckets) > self._max_keys:
+                self._evict_full(now)
+            levels = []
+            wait = 0.0
+            for key, capacity, rate in buckets:
+                tokens, last = self._buckets.get(key, (capacity, now))
+                tokens = min(capacity, tokens + (now - last) * rate)
+                levels.append(tokens)
+                if tokens < 1:
+                    wait = max(wait, (1 - tokens) / rate)
+            allowed = wait == 0
+            for (key, _, _), tokens in zip(buckets, levels):
+                self._buckets[key] = [tokens - 1 if allowed else tokens, now]
+            return allowed, wait
+
+    def _evict_full(self, now: float):
+        """Drop buckets idle for an hour; they have long since refilled"""
+        self._buckets = {
+            key: (tokens, last) for key, (tokens, last) in self._buckets.items()
+            if now - last < 3600
+        }
+
+class RateLimiter:
+    """
+    Token-bucket rate limiter backed by Redis, with an in-process fallback.
+
+    All buckets for a request are checked and charged in one Lua script, so
+    a request rejected by the global bucket does not use up the caller's
+    own allowance. When Redis is unreachable the limiter switches to
+    per-process buckets and retries Redis after a cool-down.
+    """
+
+    def __init__(self):
+        self._redis = aioredis.Redis.from_url(
+            settings.REDIS_URL,
+            socket_connect_timeout=0.25,
+            socket_timeout=0.25
+        )
+        self._script = self._redis.register_script(TOKEN_BUCKET_SCRIPT)
+        self._local = LocalTokenBuckets()
+        self._redis_retry_at = 0.0
+
+    async def acquire(self, buckets: List[Bucket]) -> Tuple[bool, float]:
+        """Take one token from every bucket; returns (allowed, retry after seconds)"""
+        if time.monotonic() >= self._redis_retry_at:
+            try:
+                keys = [key for key, _, _ in buckets]
+                args = [value for _, capacity, rate in buckets for value in (capacity, rate)]
+                allowed, wait = await self._script(keys=keys, args=args)
+                return bool(allowed), float(wait)
+            except (RedisError, OSError) as e:
+                logger.warning(f"Rate limiter falling back to in-process buckets: {e}")
+                self._redis_retry_at = time.monotonic() + settings.RATE_LIMIT_REDIS_RETRY_SECONDS
+        return self._local.acquire(buckets)
+
+rate_limiter = RateLimiter()
+
+def _client_identity(request: Request) -> str:
+    """
+    Identify the caller by JWT subject, falling back to the client address.
+
+    The token comes from the Authorization header or, for EventSource
+    clients that cannot set headers, the ?token= query parameter. Behind a
+    reverse proxy the client address is only the caller's own when uvicorn
+    trusts the proxy's X-Forwarded-For (FORWARDED_ALLOW_IPS); otherwise
+    every anonymous caller shares the proxy's bucket.
+    """
+    authorization = request.headers.get("Authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        token = request.query_params.get("token")
+    if token:
+        try:
+            payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.ALGORITHM])
+            if payload.get("sub"):
+                return f"user:{payload['sub']}"
+        except JWTError:
+            pass
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+def _buckets_for(request: Request) -> Optional[List[Bucket]]:
+    path = request.url.path
+    if not path.startswith(settings.API_V1_STR) or request.method == "OPTIONS":
+        return None
+
+    identity = _client_identity(request)
+    if (request.method, path) in INFERENCE_ROUTES or any(
+        request.method == method and pattern.fullmatch(path) for method, pattern in INFERENCE_ROUTE_PATTERNS
+    ):
+        buckets = [
+            (f"ratelimit:inference:{identity}", settings.RATE_LIMIT_INFERENCE_BURST,
+             settings.RATE_LIMIT_INFERENCE_PER_MINUTE / 60),
+        ]
+        # Only callers with a valid token share the global budget, so anonymous
+        # requests (rejected later with 401) cannot drain it for everyone else
+        if identity.startswith("user:"):
+            buckets.append(
+                ("ratelimit:inference:global", settings.RATE_LIMIT_GLOBAL_INFERENCE_BURST,
+                 settings.RATE_LIMIT_GLOBAL_INFERENCE_PER_MINUTE / 60)
+            )
+        return buckets
+    return [
+        (f"ratelimit:read:{identity}", settings.RATE_LIMIT_READ_BURST,
+         settings.RATE_LIMIT_READ_PER_MINUTE / 60),
+    ]
+
+async def rate_limit_middleware(request: Request, call_next):
+    """Reject requests over their token-bucket limits with 429 and Retry-After"""
+    buckets = _buckets_for(request) if settings.RATE_LIMIT_ENABLED else None
+    if not buckets:
+        return await call_next(request)
+
+    allowed, wait = await rate_limiter.acquire(buckets)
+    if not allowed:
+        return JSONResponse(
+            status_code=429,
+            content={"detail": "Rate limit exceeded, please retry later"},
+            headers={"Retry-After": str(max(1, math.ceil(wait)))}
+        )
+    return await call_next(request)
@@ -0,0 +1,70 @@
+import logging
+import os
+import threading
+import time
+from typing import Optional, Set
+
+logger = logging.getLogger(__name__)
+
+class DrainState:
+    """
+    Tracks whether this worker is shutting down, and the uploads it has
+    written to UPLOAD_DIR but not yet committed a Prediction row for.
+
+    Draining starts when the worker receives SIGTERM/SIGINT, while the
+    server is still finishing in-flight requests: from then on new
+    inference work is refused with 503, /health reports not ready and event
+    streams are closed so they do not hold the shutdown open. Uploads still
+    pending when the app shuts down are partial and get removed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started_at: Optional[float] = None
+        self._pending_uploads: Set[str] = set()
+
+    @property
+    def draining(self) -> bool:
+        return self._started_at is not None
+
+    def begin(self) -> bool:
+        """Start draining; returns False if it had already started"""
+        with self._lock:
+            if self._started_at is not None:
+                return False
+            self._started_at = time.perf_counter()
+        logger.info("Draining: refusing new inference work")
+        return True
+
+    def elapsed(self) -> float:
+        """Seconds since draining started"""
+        return time.perf_counter() - self._started_at if self._started_at is not None else 0.0
+
+    def track_upload(self, path: str):
+        with self._lock:
+            self._pending_uploads.add(path)
+
+    def release_upload(self, path: str) -> bool:
+        """Stop tracking an upload; returns True if it was still pending"""
+        with self._lock:
+            if path not in self._pending_uploads:
+                return False
+            self._pending_uploads.discard(path)
+            return True
+
+    def remove_pending_uploads(self) -> int:
+        """Delete uploads that never got a Prediction row; returns how many were removed"""
+        with self._lock:
+            pending, self._pending_uploads = self._pending_uploads, set()
+        removed = 0
+        for path in pending:
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not remove partial upload {path}: {e}")
+        return removed
+
+drain_state = DrainState()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Backfill perceptual hashes for predictions stored before near-duplicate
+detection was added.
+
+Walks predictions without an image_phash in id order, hashes their images
+from the uploads store in a process pool and bulk-updates the rows. Rows
+whose image can no longer be read are skipped. Safe to interrupt and rerun:
+hashed rows drop out of the query. Running API workers pick the new hashes
+up on their next full index reload (DUPLICATE_INDEX_REFRESH_SECONDS).
+
+Run from the backend directory:
+    python -m app.jobs.phash_backfill --workers 4
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+from sqlalchemy import select, update
+
+from app.core.database import SessionLocal
+from app.models.models import Prediction
+from app.services.duplicate_index import perceptual_hash
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows hashed and written per batch")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Hashing processes")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    hashed = unreadable = 0
+    last_id = 0
+    with multiprocessing.Pool(args.workers) as pool:
+        while True:
+            db = SessionLocal()
+            try:
+                rows = db.execute(
+                    select(Prediction.id, Prediction.image_path)
+                    .where(Prediction.id > last_id, Prediction.image_phash.is_(None))
+                    .order_by(Prediction.id)
+                    .limit(args.batch_size)
+                ).all()
+                if not rows:
+                    break
+                last_id = rows[-1].id
+
+                hashes = pool.map(perceptual_hash, [row.image_path for row in rows], chunksize=16)
+                updates = [
+                    {"id": row.id, "image_phash": image_hash}
+                    for row, image_hash in zip(rows, hashes)
+                    if image_hash is not None
+                ]
+                if updates:
+                    db.execute(update(Prediction), updates)
+                    db.commit()
+            finally:
+                db.close()
+
+            hashed += len(updates)
+            unreadable += len(rows) - len(updates)
+            print(f"Hashed up to id {last_id}: {hashed} hashed, {unreadable} unreadable")
+
+    elapsed = time.perf_counter() - started
+    print(f"Done: {hashed} images in {elapsed:.1f}s ({hashed / elapsed if elapsed else 0:.1f} images/s)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
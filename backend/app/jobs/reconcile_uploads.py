@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Reconcile UPLOAD_DIR with the predictions table and compact old uploads.
+
+Orphans: files in UPLOAD_DIR that no Prediction.image_path refers to, left
+behind by crashed or killed workers. The directory is streamed with
+os.scandir and checked against the database in batches of IN queries on
+the indexed image_path column, so neither side is loaded into memory in
+full. Orphans older than --grace-minutes (uploads are written before their
+row is committed) are moved to UPLOAD_QUARANTINE_DIR, or deleted with
+--delete. Quarantined files older than --purge-after-days are deleted.
+
+Archive: with --archive-after-days, images of predictions older than that
+are gzipped into UPLOAD_ARCHIVE_DIR and the rows repointed at the archive.
+Archived images are kept for records but no longer served or explained.
+Images gzip cannot shrink (most PNG and JPEG files are already
+compressed) are left in place and reported as skipped.
+
+The job lowers its own CPU and I/O priority and reports the bytes it
+reclaimed. Safe to interrupt and rerun.
+
+Run from the backend directory:
+    python -m app.jobs.reconcile_uploads --dry-run
+    python -m app.jobs.reconcile_uploads --archive-after-days 365
+"""
+
+import argparse
+import gzip
+import os
+import shutil
+import subprocess
+import sys
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import select, update
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.migrations import upgrade_schema
+from app.models.models import Prediction
+
+# Bytes compressed to decide whether an image is worth archiving
+ARCHIVE_SAMPLE_BYTES = 256 * 1024
+
+def _lower_priority():
+    """Run at the lowest CPU priority and in the idle I/O class so the API is not starved"""
+    os.nice(19)
+    try:
+        subprocess.run(["ionice", "-c", "3", "-p", str(os.getpid())], check=True, capture_output=True)
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"Could not lower I/O priority ({e}); continuing at normal I/O priority")
+
+def _referenced(paths: List[str]) -> set:
+    db = SessionLocal()
+    try:
+        return set(db.scalars(select(Prediction.image_path).where(Prediction.image_path.in_(paths))))
+    finally:
+        db.close()
+
+def _remove_or_quarantine(path: str, name: str, args: argparse.Namespace):
+    if args.dry_run:
+        return
+    if args.delete:
+        os.remove(path)
+    else:
+        os.makedirs(settings.UPLOAD_QUARANTINE_DIR, exist_ok=True)
+        target = os.path.join(settings.UPLOAD_QUARANTINE_DIR, name)
+        os.replace(path, target)
+        # Start the purge clock at quarantine time, not at upload time
+        os.utime(target)
+
+def reconcile_orphans(args: argparse.Namespace, stats: Dict[str, int]):
+    cutoff = time.time() - args.grace_minutes * 60
+    batch = []
+
+    def flush():
+        referenced = _referenced([path for path, _, _ in batch])
+        for path, name, size in batch:
+            if path in referenced:
+                continue
+            _remove_or_quarantine(path, name, args)
+            stats["orphans"] += 1
+            stats["orphan_bytes"] += size
+        batch.clear()
+
+    with os.scandir(settings.UPLOAD_DIR) as entries:
+        for entry in entries:
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            stats["scanned"] += 1
+            info = entry.stat(follow_symlinks=False)
+            if info.st_mtime > cutoff:
+                continue  # may belong to an upload whose row is not committed yet
+            # Rows store os.path.join(UPLOAD_DIR, filename), so compare in that form
+            batch.append((os.path.join(settings.UPLOAD_DIR, entry.name), entry.name, info.st_size))
+            if len(batch) >= args.batch_size:
+                flush()
+    if batch:
+        flush()
+
+def purge_quarantine(args: argparse.Namespace, stats: Dict[str, int]):
+    if not os.path.isdir(settings.UPLOAD_QUARANTINE_DIR):
+        return
+    cutoff = time.time() - args.purge_after_days * 86400
+    with os.scandir(settings.UPLOAD_QUARANTINE_DIR) as entries:
+        for entry in entries:
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            info = entry.stat(follow_symlinks=False)
+            if info.st_mtime > cutoff:
+                continue
+            if not args.dry_run:
+                os.remove(entry.path)
+            stats["purged"] += 1
+            stats["purged_bytes"] += info.st_size
+
+def _compresses(source: str) -> bool:
+    """Whether gzip shrinks a sample from the start of source; already-compressed images do not"""
+    with open(source, "rb") as f:
+        sample = f.read(ARCHIVE_SAMPLE_BYTES)
+    return len(zlib.compress(sample, 6)) < len(sample)
+
+def _archive_file(source: str, target: str) -> Optional[int]:
+    """
+    Gzip source to target, written then renamed; returns the compressed size,
+    or None (and writes nothing) if the result is not smaller than source.
+    """
+    tmp_path = f"{target}.tmp"
+    with open(source, "rb") as src, gzip.open(tmp_path, "wb", compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst, 1 << 20)
+    compressed = os.path.getsize(tmp_path)
+    if compressed >= os.path.getsize(source):
+        os.remove(tmp_path)
+        return None
+    os.replace(tmp_path, target)
+    return compressed
+
+def archive_old_uploads(args: argparse.Namespace, stats: Dict[str, int]):
+    created_before = datetime.now(timezone.utc) - timedelta(days=args.archive_after_days)
+    prefix = os.path.join(settings.UPLOAD_DIR, "")
+    os.makedirs(settings.UPLOAD_ARCHIVE_DIR, exist_ok=True)
+    last_id = 0
+    while True:
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(Prediction.id, Prediction.image_path)
+                .where(
+                    Prediction.id > last_id,
+                    Prediction.created_at < created_before,
+                    Prediction.image_path.startswith(prefix, autoescape=True)
+                )
+                .order_by(Prediction.id)
+                .limit(args.batch_size)
+            ).all()
+            if not rows:
+                return
+            last_id = rows[-1].id
+
+            updates = []
+            for row in rows:
+                try:
+                    size = os.path.getsize(row.image_path)
+                except OSError:
+                    stats["archive_missing"] += 1
+                    continue
+                target = os.path.join(settings.UPLOAD_ARCHIVE_DIR, f"{os.path.basename(row.image_path)}.gz")
+                compressed = None
+                if _compresses(row.image_path):
+                    # A dry run cannot know the compressed size, so reports no saving
+                    compressed = size if args.dry_run else _archive_file(row.image_path, target)
+                if compressed is None:
+                    stats["archive_skipped"] += 1
+                    continue
+                updates.append({"id": row.id, "image_path": target, "source": row.image_path})
+                stats["archived"] += 1
+                stats["archive_source_bytes"] += size
+                stats["archived_bytes"] += size - compressed
+
+            if updates and not args.dry_run:
+                # Repoint the rows before removing the originals so no row ever references a missing file
+                db.execute(update(Prediction), [{"id": u["id"], "image_path": u["image_path"]} for u in updates])
+                db.commit()
+                for u in updates:
+                    os.remove(u["source"])
+        finally:
+            db.close()
+
+def _mb(nbytes: int) -> str:
+    return f"{nbytes / (1024 * 1024):.1f}MB"
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--grace-minutes", type=int, default=60, help="Leave unreferenced files younger than this alone")
+    parser.add_argument("--delete", action="store_true", help="Delete orphans instead of quarantining them")
+    parser.add_argument("--purge-after-days", type=int, default=30, help="Delete quarantined files older than this")
+    parser.add_argument("--archive-after-days", type=int, help="Gzip images of predictions older than this to cold storage")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Paths checked per database query")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without touching anything")
+    args = parser.parse_args()
+
+    _lower_priority()
+    # Databases created before image_path was indexed get the index here too
+    upgrade_schema()
+
+    started = time.perf_counter()
+    stats = dict.fromkeys([
+        "scanned", "orphans", "orphan_bytes", "purged", "purged_bytes",
+        "archived", "archive_source_bytes", "archived_bytes", "archive_skipped", "archive_missing"
+    ], 0)
+    if os.path.isdir(settings.UPLOAD_DIR):
+        reconcile_orphans(args, stats)
+    purge_quarantine(args, stats)
+    if args.archive_after_days is not None:
+        archive_old_uploads(args, stats)
+
+    orphan_action = "deleted" if args.delete else "quarantined"
+    # Quarantining moves bytes rather than freeing them; they are reclaimed when purged
+    reclaimed = stats["purged_bytes"] + stats["archived_bytes"] + (stats["orphan_bytes"] if args.delete else 0)
+    print(f"{'Dry run: ' if args.dry_run else ''}scanned {stats['scanned']} uploads in {time.perf_counter() - started:.1f}s")
+    print(f"  {stats['orphans']} orphans {orphan_action} ({_mb(stats['orphan_bytes'])})")
+    print(f"  {stats['purged']} quarantined files purged ({_mb(stats['purged_bytes'])})")
+    if args.archive_after_days is not None:
+        print(f"  {stats['archived']} images archived ({_mb(stats['archive_source_bytes'])}, "
+              f"{_mb(stats['archived_bytes'])} saved by compression); "
+              f"{stats['archive_skipped']} left in place as incompressible; {stats['archive_missing']} already missing")
+    print(f"Reclaimed {_mb(reclaimed)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Bulk re-scoring of stored predictions with a model version.
+
+Walks the predictions table in id order, decodes images in a process pool
+while the previous batch is on the model, and bulk-writes the results to
+prediction_scores tagged with the model version. Progress is checkpointed
+after every batch so an interrupted run resumes where it stopped.
+
+Run from the backend directory:
+    python -m app.jobs.rescore --model-version v2 --model-path models/v2.h5
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+from sqlalchemy import delete, insert, select
+
+from app.core.config import settings
+from app.core.database import SessionLocal, engine
+from app.models.models import Prediction, PredictionScore
+
+def _decode_image(args: Tuple[str, int]) -> Optional[np.ndarray]:
+    """Load and resize one image the same way MLService.preprocess_single_image does"""
+    image_path, size = args
+    try:
+        with Image.open(image_path) as img:
+            image = img.convert("RGB").resize((size, size), Image.NEAREST)
+            return np.asarray(image, dtype=np.float32) / 255.0
+    except Exception:
+        return None
+
+def _iter_batches(start_after: int, batch_size: int, limit: Optional[int]):
+    """
+    Yield lists of (id, image_path) rows in id order.
+
+    Uses keyset pagination on the primary key: each page is an index range
+    scan, memory holds one page, and the last id doubles as the resume point.
+    """
+    last_id = start_after
+    remaining = limit
+    while remaining is None or remaining > 0:
+        page_size = batch_size if remaining is None else min(batch_size, remaining)
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(Prediction.id, Prediction.image_path)
+                .where(Prediction.id > last_id)
+                .order_by(Prediction.id)
+                .limit(page_size)
+            ).all()
+        finally:
+            db.close()
+        if not rows:
+            return
+        last_id = rows[-1].id
+        if remaining is not None:
+            remaining -= len(rows)
+        yield rows
+
+def _load_checkpoint(path: str, model_version: str, mode: str) -> dict:
+    if os.path.exists(path):
+        with open(path) as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("model_version") == model_version and checkpoint.get("mode") == mode:
+            return checkpoint
+        print(f"Ignoring checkpoint {path}: it was written for a different model version or mode")
+    return {"model_version": model_version, "mode": mode, "last_id": 0, "scored": 0, "failed": 0}
+
+def _save_checkpoint(path: str, checkpoint: dict):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+def _write_scores(rows: List, images: List[Optional[np.ndarray]], ml_service, model_version: str, mode: str, batch_size: int) -> Tuple[int, int]:
+    """Score one decoded batch and replace any earlier scores for it; returns (scored, failed)"""
+    decoded = [(row.id, image) for row, image in zip(rows, images) if image is not None]
+    failed = len(rows) - len(decoded)
+    if not decoded:
+        return 0, failed
+
+    _, results = ml_service.predict_batch(
+        np.stack([image for _, image in decoded]),
+        mode=mode,
+        model_version=model_version,
+        batch_size=batch_size
+    )
+
+    prediction_ids = [prediction_id for prediction_id, _ in decoded]
+    db = SessionLocal()
+    try:
+        # Deleting first makes a batch safe to replay after a crash before its checkpoint
+        db.execute(
+            delete(PredictionScore).where(
+                PredictionScore.prediction_id.in_(prediction_ids),
+                PredictionScore.model_version == model_version,
+                PredictionScore.inference_mode == mode
+            )
+        )
+        db.execute(
+            insert(PredictionScore),
+            [
+                {
+                    "prediction_id": prediction_id,
+                    "model_version": model_version,
+                    "inference_mode": mode,
+                    "prediction_result": result["prediction"],
+                    "confidence_score": result["confidence"],
+                    "probabilities": ml_service.encode_probabilities(result["probabilities"]),
+                }
+                for prediction_id, result in zip(prediction_ids, results)
+            ]
+        )
+        db.commit()
+    finally:
+        db.close()
+
+    return len(decoded), failed
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-version", help="Version to tag results with (default: the active model)")
+    parser.add_argument("--model-path", help="Model file to load as --model-version")
+    parser.add_argument("--mode", choices=["fast", "augmented"], default=settings.DEFAULT_INFERENCE_MODE)
+    parser.add_argument("--batch-size", type=int, default=512, help="Rows decoded and scored per batch")
+    parser.add_argument("--predict-batch-size", type=int, default=64, help="Forward pass batch size")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Image decoding processes")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: rescore_<version>_<mode>.json)")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    parser.add_argument("--limit", type=int, help="Stop after this many rows")
+    args = parser.parse_args()
+
+    PredictionScore.__table__.create(bind=engine, checkfirst=True)
+
+    # Start the decoding workers before TensorFlow is imported so they never inherit its threads
+    pool = multiprocessing.Pool(args.workers)
+    try:
+        return _run(args, parser, pool)
+    finally:
+        pool.close()
+        pool.join()
+
+def _run(args: argparse.Namespace, parser: argparse.ArgumentParser, pool) -> int:
+    from app.services.ml_service import ml_service
+
+    if args.model_path:
+        if not args.model_version:
+            parser.error("--model-path requires --model-version")
+        ml_service.registry.load(args.model_version, args.model_path, activate=False)
+    model_version = args.model_version or ml_service.model_version
+    try:
+        ml_service.registry.get(model_version)
+    except KeyError:
+        print(f"Model version {model_version} is not loaded; pass --model-path")
+        return 1
+
+    checkpoint_path = args.checkpoint or f"rescore_{model_version}_{args.mode}.json"
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    checkpoint = _load_checkpoint(checkpoint_path, model_version, args.mode)
+    if checkpoint["last_id"]:
+        print(f"Resuming after prediction id {checkpoint['last_id']} ({checkpoint['scored']} already scored)")
+
+    size = settings.MODEL_INPUT_SIZE
+    chunksize = max(1, args.batch_size // (args.workers * 4))
+    started = time.perf_counter()
+    run_scored = 0
+
+    def process(rows, pending_images):
+        nonlocal run_scored
+        scored, failed = _write_scores(
+            rows, pending_images.get(), ml_service, model_version, args.mode, args.predict_batch_size
+        )
+        run_scored += scored
+        checkpoint["last_id"] = rows[-1].id
+        checkpoint["scored"] += scored
+        checkpoint["failed"] += failed
+        _save_checkpoint(checkpoint_path, checkpoint)
+        elapsed = time.perf_counter() - started
+        print(f"Scored up to id {rows[-1].id}: {checkpoint['scored']} total, "
+              f"{checkpoint['failed']} unreadable, {run_scored / elapsed:.1f} images/s")
+
+    # Decode batch N+1 in the pool while batch N is on the model; at most two batches are in memory
+    pending = None
+    for rows in _iter_batches(checkpoint["last_id"], args.batch_size, args.limit):
+        images = pool.map_async(_decode_image, [(row.image_path, size) for row in rows], chunksize)
+        if pending:
+            process(*pending)
+        pending = (rows, images)
+    if pending:
+        process(*pending)
+
+    elapsed = time.perf_counter() - started
+    print(f"Done: {run_scored} images in {elapsed:.1f}s "
+          f"({run_scored / elapsed if elapsed else 0:.1f} images/s) with model {model_version}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
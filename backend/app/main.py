@@ -1,12 +1,27 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
+from contextlib import asynccontextmanager
+import anyio.to_thread
+import asyncio
 import os
+import signal
+import threading
+import time
 
 from app.core.config import settings
 from app.api.api_v1.api import api_router
 from app.core.database import engine
+from app.core.migrations import upgrade_schema
+from app.core.profiling import profiling_middleware
+from app.core.rate_limit import rate_limit_middleware
+from app.core.shutdown import drain_state
 from app.models import models
+from app.services.event_broker import event_broker
+from app.services.inference_replicas import get_replica_pool
+from app.services.inference_scheduler import inference_scheduler
+from app.services.ml_service import ml_service
 import logging
 
 # Configure logging
@@ -17,19 +32,85 @@ logger = logging.getLogger(__name__)
 try:
     logger.info("Creating database tables...")
     models.Base.metadata.create_all(bind=engine)
+    # create_all does not alter existing tables; add columns introduced since they were created
+    upgrade_schema(engine)
     logger.info("Database tables created successfully!")
 except Exception as e:
     logger.error(f"Database connection failed: {e}")
     logger.error("Please check your DATABASE_URL environment variable")
     # Don't exit - let the app start so we can see the error in logs
 
+def begin_drain():
+    """Refuse new work and end open event streams so in-flight requests can finish"""
+    if drain_state.begin():
+        event_broker.close_subscriptions()
+
+def install_drain_signal_handlers(loop: asyncio.AbstractEventLoop):
+    """
+    Start draining as soon as SIGTERM/SIGINT arrives, while uvicorn is still
+    waiting for in-flight requests; the app's own shutdown only runs after that.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return  # e.g. under TestClient; signals can only be handled on the main thread
+
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        previous = signal.getsignal(sig)
+
+        def handler(signum, frame, previous=previous):
+            loop.call_soon_threadsafe(begin_drain)
+            if callable(previous):
+                # uvicorn's handler, or the no-op asyncio leaves when it dispatches through the loop
+                previous(signum, frame)
+            else:
+                signal.signal(signum, previous)
+                os.kill(os.getpid(), signum)
+
+        signal.signal(sig, handler)
+
+def drain(timeout: float):
+    """Wait for remaining inference work, then release resources and partial uploads"""
+    begin_drain()
+    scheduler = inference_scheduler.drain(timeout)
+    replica_pool = get_replica_pool()
+    if replica_pool is not None:
+        replica_pool.close()
+    # Shadow comparisons only feed in-memory stats that die with the process
+    ml_service.rollout.shutdown(wait=False)
+    removed = drain_state.remove_pending_uploads()
+    engine.dispose()
+    return scheduler, removed
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    install_drain_signal_handlers(asyncio.get_running_loop())
+    if settings.THREADPOOL_WORKERS:
+        # Cap the threads behind sync endpoints and run_in_threadpool so they do not crowd TensorFlow's cores
+        anyio.to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_WORKERS
+    replica_pool = get_replica_pool()
+    if replica_pool is not None:
+        replica_pool.start()
+    yield
+
+    started = time.perf_counter()
+    scheduler, removed = await asyncio.to_thread(drain, settings.SHUTDOWN_DRAIN_SECONDS)
+    logger.info(
+        f"Shutdown drained in {drain_state.elapsed():.2f}s "
+        f"({time.perf_counter() - started:.2f}s after the last request): "
+        f"inference {'idle' if scheduler['idle'] else 'still running at deadline'}, "
+        f"{scheduler['cancelled']} queued jobs cancelled, {removed} partial uploads removed"
+    )
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version="1.0.0",
     description="CancerGuard AI - AI-powered breast cancer detection platform",
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
+# Rate limiting (registered before CORS so 429 responses still carry CORS headers)
+app.middleware("http")(rate_limit_middleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -43,6 +124,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in per-request profiling (see PROFILING_ENABLED)
+app.middleware("http")(profiling_middleware)
+
 # Mount static files
 if not os.path.exists("uploads"):
     os.makedirs("uploads")
@@ -61,6 +145,9 @@ async def root():
 
 @app.get("/health")
 async def health_check():
+    # Fails readiness while draining so load balancers stop routing here
+    if drain_state.draining:
+        return JSONResponse(status_code=503, content={"status": "draining", "service": "CancerGuard AI API"})
     return {"status": "healthy", "service": "CancerGuard AI API"}
 
 if __name__ == "__main__":
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, Boolean, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Float, Boolean, Text, ForeignKey, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -13,6 +13,7 @@ class User(Base):
     full_name = Column(String)
     is_active = Column(Boolean, default=True)
     is_superuser = Column(Boolean, default=False)
+    role = Column(String, default="clinician")  # "clinician" or "integration"
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -23,11 +24,16 @@ class Prediction(Base):
     __tablename__ = "predictions"
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    image_path = Column(String, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    image_path = Column(String, nullable=False, index=True)  # looked up by reconcile_uploads
     prediction_result = Column(String, nullable=False)  # "Benign" or "Malignant"
     confidence_score = Column(Float, nullable=False)
+    probabilities = Column(LargeBinary)  # float32 per class, see MLService.encode_probabilities
     processing_time = Column(Float)  # in seconds
+    model_version = Column(String, index=True)  # registry version that produced the result
+    inference_mode = Column(String)  # "fast" or "augmented"
+    image_phash = Column(String(16))  # perceptual hash, see duplicate_index.perceptual_hash
+    duplicate_of = Column(Integer, ForeignKey("predictions.id"))  # prediction whose result was reused
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Additional metadata
@@ -38,6 +44,23 @@ class Prediction(Base):
     # Relationships
     user = relationship("User", back_populates="predictions")
 
+class PredictionScore(Base):
+    """Result of re-scoring a stored prediction's image with another model version"""
+    __tablename__ = "prediction_scores"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    prediction_id = Column(Integer, ForeignKey("predictions.id"), nullable=False)
+    model_version = Column(String, nullable=False)
+    inference_mode = Column(String, nullable=False)
+    prediction_result = Column(String, nullable=False)  # "Benign" or "Malignant"
+    confidence_score = Column(Float, nullable=False)
+    probabilities = Column(LargeBinary)  # float32 per class, see MLService.encode_probabilities
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_prediction_scores_prediction_version", "prediction_id", "model_version"),
+    )
+
 class SystemMetrics(Base):
     __tablename__ = "system_metrics"
     
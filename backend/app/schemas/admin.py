@@ -0,0 +1,114 @@
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+from datetime import datetime
+
+class ModelVersionResponse(BaseModel):
+    version: str
+    active: bool
+    status: str
+    path: Optional[str] = None
+    loaded_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+class ModelReloadRequest(BaseModel):
+    version: str
+    filename: Optional[str] = None  # relative to MODEL_DIR, defaults to "<version>.h5"
+    activate: bool = True
+
+class ModelReloadResponse(BaseModel):
+    version: str
+    status: str
+    message: str
+
+class LatencySummary(BaseModel):
+    p50_ms: Optional[float] = None
+    p95_ms: Optional[float] = None
+
+class ShadowStats(BaseModel):
+    version: Optional[str] = None
+    sample_rate: float
+    requests: int
+    errors: int
+    dropped: int
+    pending: int
+    agreement_rate: Optional[float] = None
+    mean_max_probability_abs_diff: Optional[float] = None  # largest per-class difference, averaged over requests
+    latency: LatencySummary
+
+class CanaryStats(BaseModel):
+    version: Optional[str] = None
+    traffic_percent: float
+    requests: int
+    errors: int
+    rolled_back: bool
+    rollback_reason: Optional[str] = None
+    latency: LatencySummary
+
+class RolloutStatsResponse(BaseModel):
+    active_version: Optional[str] = None
+    primary_latency: LatencySummary
+    shadow: ShadowStats
+    canary: CanaryStats
+
+class ShadowConfigRequest(BaseModel):
+    version: Optional[str] = None  # None disables shadow mode
+    sample_rate: float = Field(0.1, ge=0.0, le=1.0)
+
+class CanaryConfigRequest(BaseModel):
+    version: Optional[str] = None  # None disables canary mode
+    traffic_percent: float = Field(5.0, ge=0.0, le=100.0)
+
+class PriorityClassStats(BaseModel):
+    queued: int
+    dispatched: int
+    wait_p50_ms: Optional[float] = None
+    wait_p95_ms: Optional[float] = None
+    wait_max_ms: Optional[float] = None
+
+class SchedulerStatsResponse(BaseModel):
+    workers: int
+    running: int
+    bulk_min_share: float
+    classes: Dict[str, PriorityClassStats]
+
+class ReplicaStatsResponse(BaseModel):
+    index: int
+    pid: Optional[int] = None
+    cpus: List[int]
+    ready: bool
+    model_version: Optional[str] = None
+    in_flight: int
+    completed: int
+    failed: int
+    mean_latency_ms: Optional[float] = None
+
+    class Config:
+        protected_namespaces = ()
+
+class StageMemoryStats(BaseModel):
+    count: int
+    max_rss_mb: float
+    max_growth_mb: float
+    last_rss_mb: float
+    max_seconds: float
+
+class MemoryStatsResponse(BaseModel):
+    rss_mb: float
+    peak_rss_mb: float
+    limit_mb: Optional[float] = None
+    admission_threshold: float
+    reserved_mb: float
+    in_flight: int
+    rejected: int
+    stages: Dict[str, StageMemoryStats]
+
+class UserRoleRequest(BaseModel):
+    role: str = Field(..., pattern="^(clinician|integration)$")
+
+class UserRoleResponse(BaseModel):
+    id: int
+    email: str
+    role: str
+
+    class Config:
+        from_attributes = True
\ No newline at end of file
@@ -1,6 +1,19 @@
 from pydantic import BaseModel
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 from datetime import datetime
+from enum import Enum
+
+class InferenceMode(str, Enum):
+    fast = "fast"            # scan repeated across the model's input sequence
+    augmented = "augmented"  # sequence filled with test-time augmentations of the scan
+
+class InferencePriority(str, Enum):
+    interactive = "interactive"  # single scans a clinician is waiting on
+    bulk = "bulk"                # batch and integration traffic
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
 
 class PredictionBase(BaseModel):
     prediction: str
@@ -10,14 +23,27 @@ class PredictionCreate(PredictionBase):
     image_path: str
     processing_time: Optional[float] = None
 
+class DuplicateMatch(BaseModel):
+    id: int
+    distance: int  # differing bits out of 64
+
 class PredictionResponse(BaseModel):
     id: int
     prediction: str
     confidence: float
     processing_time: Optional[float] = None
     probabilities: Dict[str, float]
+    model_version: Optional[str] = None
+    inference_mode: Optional[str] = None
     image_filename: Optional[str] = None
+    duplicate_of: Optional[int] = None  # set when the result was reused from a near-duplicate
+    near_duplicates: Optional[List[DuplicateMatch]] = None  # only returned by upload
     created_at: datetime
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+        protected_namespaces = ()
+
+class NearDuplicateResponse(BaseModel):
+    distance: int
+    prediction: PredictionResponse
\ No newline at end of file
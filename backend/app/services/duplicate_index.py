@@ -0,0 +1,158 @@
+import threading
+import time
+from itertools import combinations
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.models import Prediction
+
+HASH_BITS = 64
+
+def perceptual_hash(image_path: str) -> Optional[str]:
+    """
+    64-bit difference hash (dHash) of an image as 16 hex digits.
+
+    The image is reduced to a 9x8 grayscale thumbnail and each bit records
+    whether a pixel is brighter than its right-hand neighbour, so
+    re-encoding, rescaling and small crops flip only a few bits.
+    Returns None if the image cannot be read.
+    """
+    try:
+        with Image.open(image_path) as img:
+            thumbnail = np.asarray(img.convert("L").resize((9, 8), Image.LANCZOS), dtype=np.int16)
+    except Exception:
+        return None
+    bits = (thumbnail[:, 1:] > thumbnail[:, :-1]).ravel()
+    return f"{int(np.packbits(bits).view('>u8')[0]):016x}"
+
+class DuplicateIndex:
+    """
+    Multi-index hashing over stored perceptual hashes.
+
+    Each 64-bit hash is split into `chunks` substrings with one hash table
+    per substring. Two hashes within Hamming distance r must agree on some
+    substring to within r // chunks bits (pigeonhole), so a lookup only
+    probes those neighbouring substrings and checks the candidates exactly,
+    instead of scanning every stored hash.
+
+    The index loads lazily from the predictions table, picks up new rows on
+    every lookup and reloads fully every DUPLICATE_INDEX_REFRESH_SECONDS to
+    see hashes written by the backfill job.
+    """
+
+    def __init__(self, chunks: int = 4):
+        self._chunks = chunks
+        self._chunk_bits = HASH_BITS // chunks
+        self._chunk_mask = (1 << self._chunk_bits) - 1
+        self._lock = threading.Lock()
+        self._flip_masks: Dict[int, List[int]] = {}
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in range(chunks)]
+        self._entries: Dict[int, Tuple[int, int]] = {}  # prediction id -> (hash, user id)
+        self._last_id = 0
+        self._loaded_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, prediction_id: int, user_id: int, image_hash: str):
+        with self._lock:
+            self._insert(self._tables, self._entries, prediction_id, user_id, int(image_hash, 16))
+            self._last_id = max(self._last_id, prediction_id)
+
+    def _insert(self, tables: List[Dict[int, List[int]]], entries: Dict[int, Tuple[int, int]],
+                prediction_id: int, user_id: int, value: int):
+        if prediction_id in entries:
+            return
+        entries[prediction_id] = (value, user_id)
+        for i, table in enumerate(tables):
+            table.setdefault(self._chunk(value, i), []).append(prediction_id)
+
+    def _chunk(self, value: int, i: int) -> int:
+        return (value >> (i * self._chunk_bits)) & self._chunk_mask
+
+    def _masks(self, radius: int) -> List[int]:
+        """All chunk-sized bit masks with at most `radius` bits set"""
+        if radius not in self._flip_masks:
+            self._flip_masks[radius] = [
+                sum(1 << bit for bit in bits)
+                for flipped in range(radius + 1)
+                for bits in combinations(range(self._chunk_bits), flipped)
+            ]
+        return self._flip_masks[radius]
+
+    def refresh(self):
+        """
+        Load hashes added since the last refresh, or everything when the full reload is due.
+
+        A full reload builds new tables off to the side and swaps them in at
+        once, so concurrent lookups keep using the current index meanwhile.
+        """
+        with self._lock:
+            full = time.monotonic() - self._loaded_at > settings.DUPLICATE_INDEX_REFRESH_SECONDS
+            if full:
+                self._loaded_at = time.monotonic()
+            last_id = 0 if full else self._last_id
+
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(Prediction.id, Prediction.user_id, Prediction.image_phash)
+                .where(Prediction.id > last_id, Prediction.image_phash.isnot(None))
+            ).all()
+        finally:
+            db.close()
+
+        if full:
+            tables: List[Dict[int, List[int]]] = [{} for _ in range(self._chunks)]
+            entries: Dict[int, Tuple[int, int]] = {}
+            for prediction_id, user_id, image_hash in rows:
+                self._insert(tables, entries, prediction_id, user_id, int(image_hash, 16))
+            with self._lock:
+                self._tables, self._entries = tables, entries
+                self._last_id = max((row[0] for row in rows), default=0)
+            return
+
+        with self._lock:
+            for prediction_id, user_id, image_hash in rows:
+                self._insert(self._tables, self._entries, prediction_id, user_id, int(image_hash, 16))
+                self._last_id = max(self._last_id, prediction_id)
+
+    def search(self, image_hash: str, max_distance: int, user_id: Optional[int] = None,
+               exclude_id: Optional[int] = None) -> List[Tuple[int, int]]:
+        """
+        Find stored images within max_distance bits of image_hash.
+
+        Args:
+            image_hash: Hex hash from perceptual_hash
+            max_distance: Maximum Hamming distance to report
+            user_id: Only match this user's predictions
+            exclude_id: Prediction id to leave out (the query image itself)
+
+        Returns:
+            (prediction id, distance) pairs, nearest first
+        """
+        self.refresh()
+        value = int(image_hash, 16)
+        masks = self._masks(max_distance // self._chunks)
+        matches = []
+        with self._lock:
+            candidates = set()
+            for i, table in enumerate(self._tables):
+                chunk = self._chunk(value, i)
+                for mask in masks:
+                    candidates.update(table.get(chunk ^ mask, ()))
+            for prediction_id in candidates:
+                stored, owner = self._entries[prediction_id]
+                if prediction_id == exclude_id or (user_id is not None and owner != user_id):
+                    continue
+                distance = (stored ^ value).bit_count()
+                if distance <= max_distance:
+                    matches.append((prediction_id, distance))
+        return sorted(matches, key=lambda match: (match[1], -match[0]))
+
+duplicate_index = DuplicateIndex()
@@ -0,0 +1,224 @@
+import asyncio
+import threading
+import time
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set
+
+import orjson
+import redis
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_CHANNEL = "dashboard"
+
+def user_channel(user_id: int) -> str:
+    return f"user:{user_id}"
+
+# Assign the next global event id, keep it in the channel's replay list and publish it.
+# KEYS: sequence key, replay list key. ARGV: channel, event type, JSON data, replay size.
+PUBLISH_SCRIPT = """
+local id = redis.call('INCR', KEYS[1])
+local payload = id .. '\\n' .. ARGV[1] .. '\\n' .. ARGV[2] .. '\\n' .. ARGV[3]
+redis.call('LPUSH', KEYS[2], payload)
+redis.call('LTRIM', KEYS[2], 0, tonumber(ARGV[4]) - 1)
+redis.call('PUBLISH', 'events:' .. ARGV[1], payload)
+return id
+"""
+
+@dataclass
+class Event:
+    id: int
+    channel: str
+    type: str
+    data: str  # serialized JSON
+
+    def encode(self) -> bytes:
+        """Server-sent events wire format"""
+        return f"id: {self.id}\nevent: {self.type}\ndata: {self.data}\n\n".encode()
+
+    @classmethod
+    def from_payload(cls, payload: bytes) -> "Event":
+        event_id, channel, event_type, data = payload.decode().split("\n", 3)
+        return cls(int(event_id), channel, event_type, data)
+
+@dataclass(eq=False)
+class Subscription:
+    channels: Set[str]
+    loop: asyncio.AbstractEventLoop
+    queue: asyncio.Queue = field(default_factory=asyncio.Queue)
+    lagged: bool = False
+
+class EventBroker:
+    """
+    Fans out server-sent events to subscribers on this worker.
+
+    With EVENTS_BROKER="redis", publish() goes through a Lua script that
+    assigns a global event id, keeps the event in a per-channel replay list
+    and publishes it; one listener thread per worker relays every channel
+    to local subscribers, so idle connections cost an asyncio queue each
+    and no Redis connection. With "memory", events stay in this process
+    (single-node runs).
+
+    publish() is thread-safe and may be called from sync endpoints. After a
+    Redis failure, events are dropped without contacting Redis for
+    EVENTS_REDIS_RETRY_SECONDS, so an outage does not add a connect timeout
+    to every upload. A subscriber that falls EVENTS_SUBSCRIBER_QUEUE events
+    behind is closed; its client reconnects with Last-Event-ID and catches
+    up from replay.
+    """
+
+    def __init__(self, backend: str, replay_size: int, subscriber_queue: int):
+        self._backend = backend
+        self._replay_size = replay_size
+        self._subscriber_queue = subscriber_queue
+        # Reentrant so in-memory publishes can dispatch under the lock that orders their ids
+        self._lock = threading.RLock()
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._listener: Optional[threading.Thread] = None
+        if backend == "redis":
+            self._redis = redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=0.25, socket_timeout=0.25)
+            self._script = self._redis.register_script(PUBLISH_SCRIPT)
+            self._redis_retry_at = 0.0
+        else:
+            self._next_id = 1
+            self._replay: Dict[str, deque] = {}
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len({subscription for subscriptions in self._subscribers.values() for subscription in subscriptions})
+
+    def publish(self, channel: str, event_type: str, data: dict):
+        """Publish an event to a channel; failures are logged, never raised"""
+        payload = orjson.dumps(data).decode()
+        if self._backend == "redis":
+            if time.monotonic() < self._redis_retry_at:
+                return
+            try:
+                self._script(
+                    keys=["events:seq", f"events:replay:{channel}"],
+                    args=[channel, event_type, payload, self._replay_size]
+                )
+            except (RedisError, OSError) as e:
+                logger.warning(
+                    f"Dropping {event_type} event for {channel}: {e}; "
+                    f"retrying Redis in {settings.EVENTS_REDIS_RETRY_SECONDS}s"
+                )
+                self._redis_retry_at = time.monotonic() + settings.EVENTS_REDIS_RETRY_SECONDS
+            return
+
+        with self._lock:
+            event = Event(self._next_id, channel, event_type, payload)
+            self._next_id += 1
+            self._replay.setdefault(channel, deque(maxlen=self._replay_size)).append(event)
+            self._dispatch(event)
+
+    def subscribe(self, channels: Iterable[str]) -> Subscription:
+        """Register a subscriber on the running event loop"""
+        subscription = Subscription(set(channels), asyncio.get_running_loop())
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers.setdefault(channel, set()).add(subscription)
+            if self._backend == "redis" and self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name="event-broker-listener", daemon=True)
+                self._listener.start()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    def close_subscriptions(self):
+        """End every open stream on this worker, e.g. when it starts shutting down"""
+        with self._lock:
+            subscriptions = {subscription for subscriptions in self._subscribers.values() for subscription in subscriptions}
+        for subscription in subscriptions:
+            try:
+                # The same sentinel as a lagged subscriber: clients reconnect with Last-Event-ID
+                subscription.loop.call_soon_threadsafe(subscription.queue.put_nowait, None)
+            except RuntimeError:
+                self.unsubscribe(subscription)
+
+    def replay(self, channels: Iterable[str], last_event_id: int) -> Optional[List[Event]]:
+        """
+        Events after last_event_id on the given channels, in id order.
+
+        Returns None when events may have been trimmed from a replay buffer
+        since last_event_id, in which case the client should resync over
+        the REST endpoints.
+        """
+        if self._backend == "redis":
+            try:
+                pipe = self._redis.pipeline(transaction=False)
+                for channel in channels:
+                    pipe.lrange(f"events:replay:{channel}", 0, -1)
+                buffers = [[Event.from_payload(payload) for payload in reversed(payloads)] for payloads in pipe.execute()]
+            except (RedisError, OSError) as e:
+                logger.warning(f"Event replay unavailable: {e}")
+                return None
+        else:
+            with self._lock:
+                buffers = [list(self._replay.get(channel, ())) for channel in channels]
+
+        events = []
+        for buffer in buffers:
+            if len(buffer) >= self._replay_size and buffer[0].id > last_event_id + 1:
+                return None
+            events.extend(event for event in buffer if event.id > last_event_id)
+        return sorted(events, key=lambda event: event.id)
+
+    def _dispatch(self, event: Event):
+        with self._lock:
+            subscriptions = list(self._subscribers.get(event.channel, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(self._deliver, subscription, event)
+            except RuntimeError:
+                # The subscriber's event loop has closed
+                self.unsubscribe(subscription)
+
+    def _deliver(self, subscription: Subscription, event: Event):
+        if subscription.lagged:
+            return
+        if subscription.queue.qsize() >= self._subscriber_queue:
+            subscription.lagged = True
+            event = None  # tells the stream to close
+        subscription.queue.put_nowait(event)
+
+    def _listen(self):
+        """Relay Redis pub/sub messages to local subscribers, reconnecting on errors"""
+        while True:
+            pubsub = redis.Redis.from_url(settings.REDIS_URL).pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.psubscribe("events:*")
+                for message in pubsub.listen():
+                    self._dispatch(Event.from_payload(message["data"]))
+            except (RedisError, OSError) as e:
+                logger.warning(f"Event listener lost Redis, reconnecting: {e}")
+                time.sleep(1)
+            finally:
+                pubsub.close()
+
+def publish_prediction_completed(user_id: int, prediction: dict):
+    """Notify the owner of a new prediction and update everyone's dashboard counters"""
+    event_broker.publish(user_channel(user_id), "prediction.completed", prediction)
+    counter = "malignant_predictions" if prediction["prediction"] == "Malignant" else "benign_predictions"
+    event_broker.publish(DASHBOARD_CHANNEL, "dashboard.updated", {
+        "delta": {"total_predictions": 1, "recent_predictions": 1, counter: 1}
+    })
+
+event_broker = EventBroker(
+    backend=settings.EVENTS_BROKER,
+    replay_size=settings.EVENTS_REPLAY_SIZE,
+    subscriber_queue=settings.EVENTS_SUBSCRIBER_QUEUE
+)
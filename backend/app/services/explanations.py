@@ -0,0 +1,79 @@
+import hashlib
+import io
+import os
+import uuid
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from app.core.config import settings
+from app.services.ml_service import ml_service
+
+# Colour stops for the heatmap, from low (transparent blue) to high (red)
+_COLORMAP_STOPS = np.array([0.0, 0.35, 0.65, 1.0])
+_COLORMAP_COLORS = np.array([
+    (0, 0, 255),
+    (0, 255, 255),
+    (255, 255, 0),
+    (255, 0, 0),
+], dtype=np.float32)
+
+def image_sha256(image_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(image_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def render_overlay(image_path: str, saliency: np.ndarray) -> bytes:
+    """Blend a [0, 1] saliency map over the original image and encode it as PNG"""
+    with Image.open(image_path) as img:
+        image = img.convert("RGB")
+    image.thumbnail((settings.EXPLAIN_OVERLAY_MAX_SIZE, settings.EXPLAIN_OVERLAY_MAX_SIZE))
+
+    heat = Image.fromarray((saliency * 255).astype(np.uint8)).resize(image.size, Image.BILINEAR)
+    heat = np.asarray(heat, dtype=np.float32) / 255.0
+    colors = np.stack([
+        np.interp(heat, _COLORMAP_STOPS, _COLORMAP_COLORS[:, channel]) for channel in range(3)
+    ], axis=-1)
+    alpha = (0.6 * heat)[..., None]
+    blended = np.asarray(image, dtype=np.float32) * (1 - alpha) + colors * alpha
+
+    buffer = io.BytesIO()
+    Image.fromarray(blended.astype(np.uint8)).save(buffer, "PNG", optimize=True)
+    return buffer.getvalue()
+
+def cached_explanation(image_path: str, target_label: str, model_version: str) -> Tuple[str, Optional[bytes]]:
+    """
+    Look up the overlay for an image's content, model version and explained
+    class in EXPLAIN_CACHE_DIR.
+
+    Returns:
+        The cache path and the cached PNG bytes, or None if not computed yet
+    """
+    cache_path = os.path.join(
+        settings.EXPLAIN_CACHE_DIR, model_version, f"{image_sha256(image_path)}_{target_label.lower()}.png"
+    )
+    if not os.path.exists(cache_path):
+        return cache_path, None
+    with open(cache_path, "rb") as f:
+        return cache_path, f.read()
+
+def compute_explanation(image_path: str, target_label: str, model_version: str, cache_path: str) -> bytes:
+    """Compute the saliency overlay and store it at cache_path"""
+    # Another request may have computed it while this one waited for a slot
+    if os.path.exists(cache_path):
+        with open(cache_path, "rb") as f:
+            return f.read()
+
+    _, saliency = ml_service.explain(image_path, target_label, model_version)
+    png = render_overlay(image_path, saliency)
+
+    # Write then rename so concurrent readers never see a partial file
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(png)
+    os.replace(tmp_path, cache_path)
+    return png
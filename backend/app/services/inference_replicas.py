@@ -0,0 +1,301 @@
+import glob
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+def parse_cpu_list(text: str) -> List[int]:
+    """Parse a Linux CPU list such as "0-3,8,10-11" """
+    cpus = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        cpus.extend(range(int(start), int(end or start) + 1))
+    return cpus
+
+def numa_nodes() -> List[List[int]]:
+    """CPUs this process may run on, grouped by NUMA node (one group if unknown)"""
+    allowed = os.sched_getaffinity(0)
+    nodes = []
+    paths = glob.glob("/sys/devices/system/node/node[0-9]*/cpulist")
+    for path in sorted(paths, key=lambda path: int(re.search(r"node(\d+)", path).group(1))):
+        with open(path) as f:
+            cpus = [cpu for cpu in parse_cpu_list(f.read()) if cpu in allowed]
+        if cpus:
+            nodes.append(cpus)
+    return nodes or [sorted(allowed)]
+
+def plan_core_sets(replicas: int, nodes: List[List[int]]) -> List[List[int]]:
+    """
+    Split CPUs between replicas so that no replica spans NUMA nodes when
+    there are at least as many replicas as nodes: replicas are dealt to
+    nodes round-robin and each node's CPUs are divided evenly among the
+    replicas placed on it. With fewer replicas than nodes, each replica
+    takes whole nodes.
+    """
+    if replicas <= len(nodes):
+        return [sorted(itertools.chain.from_iterable(nodes[i::replicas])) for i in range(replicas)]
+
+    core_sets: List[List[int]] = [[] for _ in range(replicas)]
+    for node_index, cpus in enumerate(nodes):
+        placed = list(range(node_index, replicas, len(nodes)))
+        share, extra = divmod(len(cpus), len(placed))
+        start = 0
+        for position, replica in enumerate(placed):
+            size = share + (position < extra)
+            # More replicas than CPUs on the node: they share the whole node
+            core_sets[replica] = cpus[start:start + size] if size else list(cpus)
+            start += size
+    return core_sets
+
+@contextmanager
+def _replica_environment(cpus: List[int]):
+    """
+    Thread pool sizes for a replica, passed through the environment because
+    a spawned child builds its settings (and TensorFlow) while importing.
+    """
+    overrides = {
+        "TF_INTRA_OP_THREADS": str(settings.TF_INTRA_OP_THREADS or len(cpus)),
+        # A replica runs one request at a time, so independent ops rarely overlap
+        "TF_INTER_OP_THREADS": str(settings.TF_INTER_OP_THREADS or 1),
+    }
+    saved = {key: os.environ.get(key) for key in overrides}
+    os.environ.update(overrides)
+    try:
+        yield
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+def _replica_main(index: int, cpus: List[int], requests, results):
+    """Replica process: load the model on its own CPUs and serve predictions until told to stop"""
+    os.sched_setaffinity(0, cpus)
+    from app.services.ml_service import ml_service
+
+    results.put((None, index, True, ml_service.model_version))
+    while True:
+        job = requests.get()
+        if job is None:
+            return
+        job_id, image_path, mode = job
+        try:
+            results.put((job_id, index, True, ml_service.predict(image_path, mode=mode)))
+        except Exception as e:
+            results.put((job_id, index, False, str(e)))
+
+class _Replica:
+    def __init__(self, index: int, cpus: List[int]):
+        self.index = index
+        self.cpus = cpus
+        self.process = None
+        self.requests = None
+        self.ready = False
+        self.model_version = None
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+
+class ReplicaPool:
+    """
+    N model replicas in separate processes, each bound to its own core set
+    with TensorFlow thread pools sized to it, so concurrent requests do not
+    oversubscribe cores and first-touch allocation keeps each replica's
+    memory on its NUMA node.
+
+    predict() routes to the ready replica with the fewest requests in
+    flight. While no replica has its model loaded yet, requests run in
+    this process instead. A replica that dies fails
+    its in-flight requests and is restarted.
+
+    Replicas load models from MODEL_PATH and the SHADOW_/CANARY_ settings at
+    start; reloads and rollout changes made through the admin API apply to
+    this process only.
+    """
+
+    def __init__(self, core_sets: List[List[int]]):
+        self._context = multiprocessing.get_context("spawn")
+        self._replicas = [_Replica(index, cpus) for index, cpus in enumerate(core_sets)]
+        self._results = self._context.Queue()
+        self._lock = threading.Lock()
+        self._pending: Dict[int, tuple] = {}  # job id -> (replica, future, started)
+        self._job_ids = itertools.count(1)
+        self._collector: Optional[threading.Thread] = None
+        self._closing = False
+
+    def start(self):
+        for replica in self._replicas:
+            self._spawn(replica)
+        self._collector = threading.Thread(target=self._collect, name="replica-results", daemon=True)
+        self._collector.start()
+
+    def _spawn(self, replica: _Replica):
+        replica.ready = False
+        replica.requests = self._context.Queue()
+        replica.process = self._context.Process(
+            target=_replica_main,
+            args=(replica.index, replica.cpus, replica.requests, self._results),
+            name=f"inference-replica-{replica.index}",
+            daemon=True
+        )
+
+        def launch():
+            # Affinity is per thread and inherited by the child from birth,
+            # so TensorFlow's threads in the replica start out pinned too
+            os.sched_setaffinity(0, replica.cpus)
+            replica.process.start()
+
+        with _replica_environment(replica.cpus):
+            launcher = threading.Thread(target=launch, name=f"replica-launcher-{replica.index}")
+            launcher.start()
+            launcher.join()
+        logger.info(f"Started inference replica {replica.index} (pid {replica.process.pid}) on CPUs {replica.cpus}")
+
+    def predict(self, image_path: str, mode: str = None) -> Dict:
+        """Same contract as MLService.predict, served by the least-loaded replica"""
+        with self._lock:
+            ready = [replica for replica in self._replicas if replica.ready]
+            if ready:
+                replica = min(ready, key=lambda replica: (replica.in_flight, replica.busy_seconds))
+                replica.in_flight += 1
+                job_id = next(self._job_ids)
+                future = Future()
+                self._pending[job_id] = (replica, future, time.perf_counter())
+        if not ready:
+            from app.services.ml_service import ml_service
+            return ml_service.predict(image_path, mode=mode)
+
+        replica.requests.put((job_id, image_path, mode))
+        return future.result()
+
+    def _collect(self):
+        """Resolve futures from replica results and restart replicas that died"""
+        last_checked = time.monotonic()
+        while not self._closing:
+            if time.monotonic() - last_checked >= 1.0:
+                self._check_alive()
+                last_checked = time.monotonic()
+            try:
+                job_id, index, ok, payload = self._results.get(timeout=1.0)
+            except queue.Empty:
+                continue
+
+            with self._lock:
+                replica = self._replicas[index]
+                if job_id is None:
+                    replica.ready = True
+                    replica.model_version = payload
+                    logger.info(f"Inference replica {index} ready with model {payload}")
+                    continue
+                pending = self._pending.pop(job_id, None)
+                if pending is None:
+                    continue
+                _, future, started = pending
+                replica.in_flight -= 1
+                replica.busy_seconds += time.perf_counter() - started
+                if ok:
+                    replica.completed += 1
+                else:
+                    replica.failed += 1
+            if ok:
+                future.set_result(payload)
+            else:
+                future.set_exception(RuntimeError(f"Inference replica {index} failed: {payload}"))
+
+    def _check_alive(self):
+        for replica in self._replicas:
+            if self._closing or replica.process is None or replica.process.is_alive():
+                continue
+            with self._lock:
+                lost = [
+                    (job_id, future) for job_id, (owner, future, _) in self._pending.items() if owner is replica
+                ]
+                for job_id, _ in lost:
+                    del self._pending[job_id]
+                replica.failed += len(lost)
+                replica.in_flight = 0
+            for _, future in lost:
+                future.set_exception(RuntimeError(f"Inference replica {replica.index} exited"))
+            logger.warning(f"Inference replica {replica.index} exited with code {replica.process.exitcode}, restarting")
+            self._spawn(replica)
+
+    def stats(self) -> List[Dict]:
+        with self._lock:
+            return [
+                {
+                    "index": replica.index,
+                    "pid": replica.process.pid if replica.process else None,
+                    "cpus": replica.cpus,
+                    "ready": replica.ready,
+                    "model_version": replica.model_version,
+                    "in_flight": replica.in_flight,
+                    "completed": replica.completed,
+                    "failed": replica.failed,
+                    "mean_latency_ms": round(replica.busy_seconds / replica.completed * 1000, 3)
+                    if replica.completed else None,
+                }
+                for replica in self._replicas
+            ]
+
+    def close(self, timeout: float = 5.0):
+        """Stop the replicas once they finish the requests they already hold"""
+        self._closing = True
+        for replica in self._replicas:
+            if replica.process is not None and replica.process.is_alive():
+                replica.requests.put(None)
+        deadline = time.monotonic() + timeout
+        for replica in self._replicas:
+            if replica.process is None:
+                continue
+            replica.process.join(max(0.0, deadline - time.monotonic()))
+            if replica.process.is_alive():
+                replica.process.terminate()
+            replica.requests.close()
+        if self._collector is not None:
+            self._collector.join()
+        self._results.close()
+
+def configured_core_sets(replicas: int) -> List[List[int]]:
+    """Core set per replica from INFERENCE_REPLICA_CPUS (cycled if shorter), or planned from the NUMA layout"""
+    if settings.INFERENCE_REPLICA_CPUS:
+        core_sets = [parse_cpu_list(cpus) for cpus in settings.INFERENCE_REPLICA_CPUS.split(";")]
+        return [core_sets[i % len(core_sets)] for i in range(replicas)]
+    return plan_core_sets(replicas, numa_nodes())
+
+# Built on first use rather than at import: every spawned replica imports this
+# module to unpickle _replica_main and must not build a pool of its own
+_replica_pool: Optional[ReplicaPool] = None
+_replica_pool_lock = threading.Lock()
+
+def get_replica_pool() -> Optional[ReplicaPool]:
+    """This process's replica pool, or None when INFERENCE_REPLICAS is 0; started from the app lifespan"""
+    global _replica_pool
+    if not settings.INFERENCE_REPLICAS:
+        return None
+    with _replica_pool_lock:
+        if _replica_pool is None:
+            _replica_pool = ReplicaPool(configured_core_sets(settings.INFERENCE_REPLICAS))
+        return _replica_pool
+
+def predict_image(image_path: str, mode: str = None) -> Dict:
+    """Run a prediction on the replica pool if one is configured, otherwise in this process"""
+    replica_pool = get_replica_pool()
+    if replica_pool is not None:
+        return replica_pool.predict(image_path, mode=mode)
+    from app.services.ml_service import ml_service
+    return ml_service.predict(image_path, mode=mode)
@@ -0,0 +1,160 @@
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.profiling import run_profiled
+
+PRIORITY_CLASSES = ("interactive", "bulk")
+
+class SchedulerFullError(Exception):
+    """Raised when a priority class already has INFERENCE_MAX_QUEUED jobs waiting"""
+
+class SchedulerClosedError(Exception):
+    """Raised when the scheduler has been closed for shutdown"""
+
+class InferenceScheduler:
+    """
+    Runs inference jobs on a fixed pool of worker threads in priority order.
+
+    Interactive jobs always go ahead of queued bulk jobs, except that bulk
+    is guaranteed INFERENCE_BULK_MIN_SHARE of recent dispatches while it has
+    work waiting, so a steady stream of interactive uploads cannot starve
+    it. Jobs already running are never interrupted.
+    """
+
+    def __init__(self, workers: int, bulk_min_share: float, max_queued: int):
+        self._workers = workers
+        self._bulk_min_share = bulk_min_share
+        self._max_queued = max_queued
+        self._queues = {priority: deque() for priority in PRIORITY_CLASSES}
+        self._recent_dispatches = deque(maxlen=20)
+        self._condition = threading.Condition()
+        self._threads = []
+        self._running = 0
+        self._closed = False
+        self._stats = {
+            priority: {"dispatched": 0, "waits": deque(maxlen=1000)}
+            for priority in PRIORITY_CLASSES
+        }
+
+    def submit(self, func: Callable, *args, priority: str = "interactive", **kwargs) -> Future:
+        """Queue func(*args, **kwargs) and return a Future for its result"""
+        if priority not in self._queues:
+            raise ValueError(f"Unknown priority class: {priority}")
+
+        future = Future()
+        with self._condition:
+            if self._closed:
+                raise SchedulerClosedError("Inference scheduler is shutting down")
+            if len(self._queues[priority]) >= self._max_queued:
+                raise SchedulerFullError(f"Too many queued {priority} inference jobs")
+            self._start_workers()
+            context = contextvars.copy_context()
+            self._queues[priority].append((time.perf_counter(), future, context, func, args, kwargs))
+            self._condition.notify()
+        return future
+
+    async def run(self, func: Callable, *args, priority: str = "interactive", **kwargs) -> Any:
+        """Submit a job and await its result without blocking the event loop"""
+        return await asyncio.wrap_future(self.submit(func, *args, priority=priority, **kwargs))
+
+    def stats(self) -> Dict:
+        """Queue depth, dispatch counts and queue wait percentiles per class"""
+        with self._condition:
+            classes = {}
+            for priority in PRIORITY_CLASSES:
+                waits = np.fromiter(self._stats[priority]["waits"], dtype=np.float64) * 1000
+                classes[priority] = {
+                    "queued": len(self._queues[priority]),
+                    "dispatched": self._stats[priority]["dispatched"],
+                    "wait_p50_ms": round(float(np.percentile(waits, 50)), 3) if waits.size else None,
+                    "wait_p95_ms": round(float(np.percentile(waits, 95)), 3) if waits.size else None,
+                    "wait_max_ms": round(float(waits.max()), 3) if waits.size else None,
+                }
+            return {
+                "workers": self._workers,
+                "running": self._running,
+                "bulk_min_share": self._bulk_min_share,
+                "classes": classes,
+            }
+
+    def drain(self, timeout: float) -> Dict:
+        """
+        Close the scheduler and wait up to timeout seconds for queued and
+        running jobs to finish. Jobs still queued at the deadline are
+        cancelled; running jobs cannot be interrupted.
+
+        Returns:
+            Whether the scheduler went idle, and how many jobs were cancelled
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            self._closed = True
+            idle = self._condition.wait_for(
+                lambda: not any(self._queues.values()) and self._running == 0,
+                max(0.0, deadline - time.monotonic())
+            )
+            cancelled = 0
+            for queue in self._queues.values():
+                while queue:
+                    _, future, *_ = queue.popleft()
+                    cancelled += int(future.cancel())
+        return {"idle": idle, "cancelled": cancelled}
+
+    def _start_workers(self):
+        # Started lazily so importing the module (e.g. from offline jobs) spawns no threads
+        while len(self._threads) < self._workers:
+            thread = threading.Thread(
+                target=self._worker, name=f"inference-worker-{len(self._threads)}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def _next_job(self):
+        """Pick the next job; caller holds the condition"""
+        interactive, bulk = self._queues["interactive"], self._queues["bulk"]
+        if bulk and interactive:
+            recent_bulk = sum(1 for priority in self._recent_dispatches if priority == "bulk")
+            bulk_share = recent_bulk / len(self._recent_dispatches) if self._recent_dispatches else 0.0
+            priority = "bulk" if bulk_share < self._bulk_min_share else "interactive"
+        else:
+            priority = "interactive" if interactive else "bulk"
+        self._recent_dispatches.append(priority)
+        return priority, self._queues[priority].popleft()
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                while not self._queues["interactive"] and not self._queues["bulk"]:
+                    self._condition.wait()
+                priority, (enqueued_at, future, context, func, args, kwargs) = self._next_job()
+                self._stats[priority]["dispatched"] += 1
+                self._stats[priority]["waits"].append(time.perf_counter() - enqueued_at)
+                self._running += 1
+
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        # Run in the submitter's context so request-scoped state (profiling) follows the job
+                        future.set_result(context.run(run_profiled, func, *args, **kwargs))
+                    except BaseException as e:
+                        future.set_exception(e)
+            finally:
+                with self._condition:
+                    self._running -= 1
+                    # Wake drain() as well as idle workers
+                    self._condition.notify_all()
+
+inference_scheduler = InferenceScheduler(
+    # Each replica needs a worker blocked on it to be kept busy
+    workers=max(settings.INFERENCE_WORKERS, settings.INFERENCE_REPLICAS),
+    bulk_min_share=settings.INFERENCE_BULK_MIN_SHARE,
+    max_queued=settings.INFERENCE_MAX_QUEUED
+)
@@ -4,29 +4,106 @@ from tensorflow.keras.models import load_model
 from tensorflow.keras.preprocessing.image import img_to_array, load_img
 from PIL import Image
 import os
+import struct
 import time
-from typing import Tuple, Dict
+from typing import Tuple, Dict, List, Optional
 from app.core.config import settings
+from app.core.memory import memory_governor
+from app.services.model_registry import ModelRegistry
+from app.services.model_rollout import ModelRollout
+
+DUMMY_MODEL_VERSION = "dummy"
+
+INFERENCE_MODES = ("fast", "augmented")
+
+# Per-frame test-time augmentations for "augmented" mode:
+# (horizontal flip, crop fraction trimmed from each side, intensity gain, intensity bias).
+# Frame 0 is always the untouched scan; the schedule repeats for longer sequences.
+AUGMENTATION_SCHEDULE = np.array([
+    (0, 0.00, 1.00, 0.00),
+    (1, 0.00, 1.00, 0.00),
+    (0, 0.05, 1.00, 0.00),
+    (1, 0.05, 1.00, 0.00),
+    (0, 0.10, 1.00, 0.00),
+    (0, 0.00, 1.08, -0.02),
+    (0, 0.00, 0.92, 0.02),
+    (1, 0.00, 1.05, 0.00),
+    (0, 0.05, 0.95, 0.01),
+    (1, 0.10, 1.00, 0.00),
+], dtype=np.float32)
+
+# Refuse to decode anything past the cap (PIL warns at the limit and raises at twice it)
+Image.MAX_IMAGE_PIXELS = settings.MAX_DECODED_PIXELS
 
 class MLService:
     def __init__(self):
-        self.model = None
+        self._configure_threads()
         self.class_labels = {0: "Benign", 1: "Malignant"}
+        # Probability vectors are stored as little-endian float32s in class index order
+        self._probability_struct = struct.Struct(f"<{len(self.class_labels)}f")
+        self.registry = ModelRegistry(
+            loader=self._load_model_file,
+            warmup=self._warm_up,
+            max_versions=settings.MODEL_REGISTRY_MAX_VERSIONS
+        )
+        self.rollout = ModelRollout(self.registry)
         self.load_model()
+        self._load_rollout_candidates()
+    
+    def _configure_threads(self):
+        """Cap TensorFlow's thread pools; must run before the first TF op"""
+        if settings.TF_INTER_OP_THREADS:
+            tf.config.threading.set_inter_op_parallelism_threads(settings.TF_INTER_OP_THREADS)
+        if settings.TF_INTRA_OP_THREADS:
+            tf.config.threading.set_intra_op_parallelism_threads(settings.TF_INTRA_OP_THREADS)
+    
+    @property
+    def model(self):
+        """The model currently serving traffic"""
+        return self.registry.active()[1]
+    
+    @property
+    def model_version(self) -> str:
+        """Version of the model currently serving traffic"""
+        return self.registry.active_version
     
     def load_model(self):
         """Load the pre-trained CNN-RNN model"""
         try:
             if os.path.exists(settings.MODEL_PATH):
-                self.model = load_model(settings.MODEL_PATH)
+                self.registry.load(settings.MODEL_VERSION, settings.MODEL_PATH)
                 print(f"Model loaded successfully from {settings.MODEL_PATH}")
             else:
                 print(f"Model file not found at {settings.MODEL_PATH}")
                 # For development, create a dummy model
-                self.model = self._create_dummy_model()
+                self.registry.register(DUMMY_MODEL_VERSION, self._create_dummy_model())
         except Exception as e:
             print(f"Error loading model: {e}")
-            self.model = self._create_dummy_model()
+            self.registry.register(DUMMY_MODEL_VERSION, self._create_dummy_model())
+    
+    def reload_model(self, version: str, model_path: str, activate: bool = True):
+        """Load a model version in the background and swap it in once warmed"""
+        return self.registry.load_in_background(version, model_path, activate=activate)
+    
+    def _load_rollout_candidates(self):
+        """Load configured shadow/canary versions from MODEL_DIR without activating them"""
+        for version in {settings.SHADOW_MODEL_VERSION, settings.CANARY_MODEL_VERSION} - {None}:
+            model_path = os.path.join(settings.MODEL_DIR, f"{version}.h5")
+            self.registry.load_in_background(version, model_path, activate=False)
+    
+    def _load_model_file(self, model_path: str):
+        """Load a saved Keras model, failing loudly if the file is missing"""
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Model file not found at {model_path}")
+        return load_model(model_path)
+    
+    def _warm_up(self, model):
+        """Run one forward pass so graph tracing happens before serving traffic"""
+        size = settings.MODEL_INPUT_SIZE
+        model.predict(
+            np.zeros((1, settings.MODEL_SEQUENCE_LENGTH, size, size, 3), dtype=np.float32),
+            verbose=0
+        )
     
     def _create_dummy_model(self):
         """Create a dummy model for development/testing"""
@@ -56,14 +133,54 @@ class MLService:
         if target_size is None:
             target_size = (settings.MODEL_INPUT_SIZE, settings.MODEL_INPUT_SIZE)
         
-        # Load and resize the image
-        image = load_img(image_path, target_size=target_size)
-        # Convert to numpy array and normalize
-        image_array = img_to_array(image) / 255.0
+        dimensions = self.image_dimensions(image_path)
+        if dimensions is not None and dimensions[0] * dimensions[1] > settings.MAX_DECODED_PIXELS:
+            raise ValueError(f"Image is {dimensions[0]}x{dimensions[1]}, over the {settings.MAX_DECODED_PIXELS} pixel limit")
+        
+        with memory_governor.stage("decode"):
+            # Load and resize the image
+            image = load_img(image_path, target_size=target_size)
+            # Convert to numpy array and normalize
+            image_array = img_to_array(image) / 255.0
         
         return image_array
     
-    def prepare_sequence_input(self, image_path: str, sequence_length: int = None, target_size: Tuple[int, int] = None) -> np.ndarray:
+    def augment_sequence(self, image_array: np.ndarray, sequence_length: int) -> np.ndarray:
+        """
+        Build a sequence of augmented views of one image in a single NumPy pass.
+        
+        Flips and crops are expressed as per-frame row/column index maps, so all
+        frames come out of one gather over the flattened pixels; intensity
+        jitter is then applied to the whole stack with broadcasting.
+        
+        Args:
+            image_array: Preprocessed image of shape (height, width, channels)
+            sequence_length: Number of frames to produce
+            
+        Returns:
+            Array of shape (sequence_length, height, width, channels)
+        """
+        height, width, _ = image_array.shape
+        schedule = np.resize(AUGMENTATION_SCHEDULE, (sequence_length, AUGMENTATION_SCHEDULE.shape[1]))
+        flip, crop, gain, bias = schedule.T
+        
+        def index_map(size: int, flipped: np.ndarray) -> np.ndarray:
+            # Centre crop by `crop` on each side, then nearest-neighbour stretch back to `size`
+            offsets = crop[:, None] * size
+            steps = np.arange(size)[None, :] * (1 - 2 * crop[:, None])
+            indices = np.clip((offsets + steps).astype(np.intp), 0, size - 1)
+            return np.where(flipped[:, None] > 0, indices[:, ::-1], indices)
+        
+        rows = index_map(height, np.zeros_like(flip))
+        cols = index_map(width, flip)
+        pixel_indices = rows[:, :, None] * width + cols[:, None, :]
+        frames = np.take(image_array.reshape(height * width, -1), pixel_indices, axis=0)
+        
+        frames *= gain[:, None, None, None]
+        frames += bias[:, None, None, None]
+        return np.clip(frames, 0.0, 1.0, out=frames)
+    
+    def prepare_sequence_input(self, image_path: str, sequence_length: int = None, target_size: Tuple[int, int] = None, mode: str = "fast") -> np.ndarray:
         """
         Prepare input to match the model's expected shape.
         
@@ -71,6 +188,8 @@ class MLService:
             image_path: Path to the image file
             sequence_length: Length of the sequence
             target_size: Target size for resizing
+            mode: "fast" repeats the scan in every frame, "augmented" fills the
+                sequence with test-time augmentations of it
             
         Returns:
             Input array of shape (1, sequence_length, height, width, channels)
@@ -79,36 +198,48 @@ class MLService:
             sequence_length = settings.MODEL_SEQUENCE_LENGTH
         if target_size is None:
             target_size = (settings.MODEL_INPUT_SIZE, settings.MODEL_INPUT_SIZE)
+        if mode not in INFERENCE_MODES:
+            raise ValueError(f"Unknown inference mode: {mode}")
         
         # Preprocess the single image
         image_array = self.preprocess_single_image(image_path, target_size)
         
-        # Duplicate the image to create a sequence
-        sequence_input = np.stack([image_array] * sequence_length, axis=0)
+        if mode == "augmented":
+            sequence_input = self.augment_sequence(image_array, sequence_length)
+        else:
+            # Duplicate the image to create a sequence
+            sequence_input = np.stack([image_array] * sequence_length, axis=0)
         
         # Add batch dimension
         sequence_input = np.expand_dims(sequence_input, axis=0)
         
         return sequence_input
     
-    def predict(self, image_path: str) -> Dict:
+    def predict(self, image_path: str, mode: str = None) -> Dict:
         """
         Make a prediction on a single image.
         
         Args:
             image_path: Path to the image file
+            mode: Inference mode ("fast" or "augmented"); defaults to DEFAULT_INFERENCE_MODE.
+                Both modes cost a single forward pass.
             
         Returns:
             Dictionary containing prediction results
         """
         start_time = time.time()
+        if mode is None:
+            mode = settings.DEFAULT_INFERENCE_MODE
+        # Pin the model for this request so a concurrent swap cannot change it midway
+        model_version, model = self.registry.active()
         
         try:
             # Prepare the sequence input
-            sequence_input = self.prepare_sequence_input(image_path)
+            sequence_input = self.prepare_sequence_input(image_path, mode=mode)
             
-            # Make a prediction
-            prediction = self.model.predict(sequence_input, verbose=0)
+            # Make a prediction (may be served by a canary and mirrored to a shadow model)
+            with memory_governor.stage("inference"):
+                model_version, prediction = self.rollout.run(sequence_input, model_version, model)
             
             # Get the class with the highest probability
             predicted_class_index = np.argmax(prediction, axis=1)[0]
@@ -121,6 +252,8 @@ class MLService:
                 "prediction": predicted_class,
                 "confidence": confidence_score,
                 "processing_time": processing_time,
+                "model_version": model_version,
+                "inference_mode": mode,
                 "probabilities": {
                     "Benign": float(prediction[0][0]),
                     "Malignant": float(prediction[0][1])
@@ -132,8 +265,142 @@ class MLService:
                 "error": str(e),
                 "prediction": None,
                 "confidence": 0.0,
-                "processing_time": time.time() - start_time
+                "processing_time": time.time() - start_time,
+                "model_version": model_version,
+                "inference_mode": mode
+            }
+    
+    def predict_batch(self, image_arrays: np.ndarray, mode: str = None, model_version: str = None, batch_size: int = 32) -> Tuple[str, List[Dict]]:
+        """
+        Make predictions on a batch of already preprocessed images.
+        
+        Used by offline jobs; bypasses canary routing and shadow mirroring.
+        
+        Args:
+            image_arrays: Array of shape (batch, height, width, channels) scaled to [0, 1]
+            mode: Inference mode ("fast" or "augmented"); defaults to DEFAULT_INFERENCE_MODE
+            model_version: Registry version to use; defaults to the active version
+            batch_size: Forward pass batch size
+            
+        Returns:
+            The model version used and one result dictionary per image
+        """
+        if mode is None:
+            mode = settings.DEFAULT_INFERENCE_MODE
+        if mode not in INFERENCE_MODES:
+            raise ValueError(f"Unknown inference mode: {mode}")
+        if model_version is None:
+            model_version, model = self.registry.active()
+        else:
+            model = self.registry.get(model_version)
+        
+        sequence_length = settings.MODEL_SEQUENCE_LENGTH
+        if mode == "augmented":
+            sequences = np.stack([self.augment_sequence(image, sequence_length) for image in image_arrays])
+        else:
+            sequences = np.repeat(image_arrays[:, None], sequence_length, axis=1)
+        
+        predictions = model.predict(sequences, batch_size=batch_size, verbose=0)
+        predicted_indices = np.argmax(predictions, axis=1)
+        
+        results = [
+            {
+                "prediction": self.class_labels[int(index)],
+                "confidence": float(probabilities[index]),
+                "model_version": model_version,
+                "inference_mode": mode,
+                "probabilities": {
+                    label: float(probabilities[class_index])
+                    for class_index, label in self.class_labels.items()
+                }
             }
+            for index, probabilities in zip(predicted_indices, predictions)
+        ]
+        return model_version, results
+    
+    def explain(self, image_path: str, target_label: str = None, model_version: str = None,
+                samples: int = None, noise: float = None) -> Tuple[str, np.ndarray]:
+        """
+        Saliency map for one image, from a single batched gradient pass.
+        
+        SmoothGrad: the scan and samples - 1 noisy copies of it go through the
+        model as one batch under a GradientTape, and the map is the mean over
+        the batch of |d score / d pixel|, taking the strongest colour channel.
+        Frames in the input sequence all share the scan, so their gradients
+        are summed back onto it.
+        
+        Args:
+            image_path: Path to the image file
+            target_label: Class to explain; defaults to the predicted class
+            model_version: Registry version to use; defaults to the active version
+            samples: Batch size, including the noise-free scan (EXPLAIN_SAMPLES)
+            noise: Standard deviation of the added noise (EXPLAIN_NOISE)
+            
+        Returns:
+            The model version used and a (height, width) map scaled to [0, 1]
+        """
+        if model_version is None:
+            model_version, model = self.registry.active()
+        else:
+            model = self.registry.get(model_version)
+        samples = samples or settings.EXPLAIN_SAMPLES
+        noise = settings.EXPLAIN_NOISE if noise is None else noise
+        
+        image_array = self.preprocess_single_image(image_path)
+        rng = np.random.default_rng(0)
+        batch = np.repeat(image_array[None], samples, axis=0)
+        batch[1:] += rng.normal(0.0, noise, batch[1:].shape).astype(np.float32)
+        sequences = tf.convert_to_tensor(
+            np.repeat(batch[:, None], settings.MODEL_SEQUENCE_LENGTH, axis=1)
+        )
+        
+        with memory_governor.stage("explain"):
+            with tf.GradientTape() as tape:
+                tape.watch(sequences)
+                probabilities = model(sequences, training=False)
+                if target_label is None:
+                    target_index = int(tf.argmax(probabilities[0]))
+                else:
+                    target_index = {label: index for index, label in self.class_labels.items()}[target_label]
+                score = tf.reduce_sum(probabilities[:, target_index])
+            gradients = tape.gradient(score, sequences).numpy()
+        
+        saliency = np.abs(gradients.sum(axis=1)).max(axis=-1).mean(axis=0)
+        # Scale by a high percentile so a few extreme pixels do not wash out the map
+        scale = np.percentile(saliency, 99) or 1.0
+        return model_version, np.clip(saliency / scale, 0.0, 1.0)
+    
+    def encode_probabilities(self, probabilities: Dict[str, float]) -> bytes:
+        """Pack a probability dictionary into its compact stored form"""
+        return self._probability_struct.pack(
+            *(probabilities[label] for _, label in sorted(self.class_labels.items()))
+        )
+    
+    def decode_probabilities(self, blob: bytes) -> Dict[str, float]:
+        """Unpack a stored probability vector into a {label: probability} dictionary"""
+        return dict(zip(
+            (label for _, label in sorted(self.class_labels.items())),
+            self._probability_struct.unpack(blob)
+        ))
+    
+    def image_dimensions(self, source) -> Optional[Tuple[int, int]]:
+        """
+        Read an image's width and height from its header without decoding pixels.
+        
+        Args:
+            source: Path or binary file object
+            
+        Returns:
+            (width, height), or None if the header cannot be parsed
+        """
+        try:
+            with Image.open(source) as img:
+                return img.size
+        except Image.DecompressionBombError:
+            # PIL refuses the open itself past twice the cap; the size is still over it
+            return (settings.MAX_DECODED_PIXELS + 1, 1)
+        except Exception:
+            return None
     
     def validate_image(self, image_path: str) -> bool:
         """
@@ -0,0 +1,117 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+class ModelRegistry:
+    """
+    Keeps several loaded model versions and the one currently serving traffic.
+
+    New versions are loaded and warmed outside the swap lock, so requests keep
+    using the active model until the new one is ready. Callers take a
+    (version, model) snapshot with active() at the start of a request; the
+    swap only replaces the reference, so in-flight requests finish on the
+    model they started with.
+    """
+
+    def __init__(self, loader: Callable[[str], Any], warmup: Callable[[Any], None], max_versions: int = 3):
+        self._loader = loader
+        self._warmup = warmup
+        self._max_versions = max_versions
+        self._models: Dict[str, Any] = {}
+        self._info: Dict[str, Dict] = {}
+        self._active_version: Optional[str] = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def register(self, version: str, model: Any, path: Optional[str] = None, activate: bool = True):
+        """Add an already loaded model, warming it before it becomes visible"""
+        self._warmup(model)
+        with self._lock:
+            self._models[version] = model
+            self._info[version] = {
+                "path": path,
+                "status": "ready",
+                "loaded_at": time.time(),
+                "error": None,
+            }
+            if activate or self._active_version is None:
+                self._active_version = version
+            self._evict_locked()
+
+    def load(self, version: str, path: str, activate: bool = True):
+        """Load, warm and optionally activate a model version (blocking)"""
+        with self._load_lock:
+            with self._lock:
+                previous = self._info.get(version)
+                self._info[version] = {
+                    "path": path,
+                    "status": "loading",
+                    "loaded_at": None,
+                    "error": None,
+                }
+            try:
+                model = self._loader(path)
+                self.register(version, model, path=path, activate=activate)
+            except Exception as e:
+                with self._lock:
+                    if version in self._models:
+                        # A previously loaded copy of this version keeps serving
+                        self._info[version] = dict(previous, error=str(e))
+                    else:
+                        self._info[version].update(status="failed", error=str(e))
+                raise
+
+    def load_in_background(self, version: str, path: str, activate: bool = True) -> threading.Thread:
+        """Start loading a model version on a daemon thread"""
+        def _run():
+            try:
+                self.load(version, path, activate=activate)
+                print(f"Model version {version} loaded from {path}")
+            except Exception as e:
+                print(f"Error loading model version {version}: {e}")
+
+        thread = threading.Thread(target=_run, name=f"model-load-{version}", daemon=True)
+        thread.start()
+        return thread
+
+    def activate(self, version: str):
+        """Make an already loaded version serve traffic"""
+        with self._lock:
+            if version not in self._models:
+                raise KeyError(f"Model version {version} is not loaded")
+            self._active_version = version
+
+    def active(self) -> Tuple[str, Any]:
+        """Snapshot of the serving (version, model) pair"""
+        with self._lock:
+            if self._active_version is None:
+                raise RuntimeError("No model version is loaded")
+            return self._active_version, self._models[self._active_version]
+
+    def get(self, version: str) -> Any:
+        """Return a loaded model by version"""
+        with self._lock:
+            if version not in self._models:
+                raise KeyError(f"Model version {version} is not loaded")
+            return self._models[version]
+
+    def list_versions(self) -> List[Dict]:
+        """Describe every known version, including ones still loading"""
+        with self._lock:
+            return [
+                {"version": version, "active": version == self._active_version, **info}
+                for version, info in self._info.items()
+            ]
+
+    @property
+    def active_version(self) -> Optional[str]:
+        return self._active_version
+
+    def _evict_locked(self):
+        """Drop the oldest inactive versions beyond max_versions"""
+        loaded = [v for v in self._models if v != self._active_version]
+        loaded.sort(key=lambda v: self._info[v]["loaded_at"] or 0)
+        while len(self._models) > self._max_versions and loaded:
+            version = loaded.pop(0)
+            del self._models[version]
+            self._info[version].update(status="evicted")
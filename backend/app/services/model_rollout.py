@@ -0,0 +1,204 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.model_registry import ModelRegistry
+
+def _latency_summary(latencies: deque) -> Dict[str, Optional[float]]:
+    """p50/p95 of a latency window in milliseconds"""
+    if not latencies:
+        return {"p50_ms": None, "p95_ms": None}
+    values = np.fromiter(latencies, dtype=np.float64) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+    }
+
+class ModelRollout:
+    """
+    Shadow and canary evaluation of a candidate model version on live traffic.
+
+    Shadow mode re-runs a sample of requests through the candidate on a
+    background thread, after the primary result is computed, and records
+    latency and disagreement. Patients always get the primary result.
+
+    Canary mode serves a percentage of requests from the candidate. If its
+    error rate or p95 latency over the recent window breaches the configured
+    thresholds, the canary is switched off and traffic returns to the
+    active version.
+    """
+
+    def __init__(self, registry: ModelRegistry):
+        self.registry = registry
+        self._lock = threading.Lock()
+        self._shadow_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow-inference")
+        self._shadow_pending = 0
+        self.primary_latencies = deque(maxlen=settings.CANARY_WINDOW)
+        self.configure_shadow(settings.SHADOW_MODEL_VERSION, settings.SHADOW_SAMPLE_RATE)
+        self.configure_canary(settings.CANARY_MODEL_VERSION, settings.CANARY_TRAFFIC_PERCENT)
+
+    def configure_shadow(self, version: Optional[str], sample_rate: float):
+        """Set (or clear, with version=None) the shadow candidate and reset its stats"""
+        with self._lock:
+            self.shadow_version = version
+            self.shadow_sample_rate = sample_rate if version else 0.0
+            self.shadow_stats = {
+                "requests": 0,
+                "errors": 0,
+                "dropped": 0,
+                "disagreements": 0,
+                "max_probability_abs_diff_sum": 0.0,
+            }
+            self.shadow_latencies = deque(maxlen=settings.CANARY_WINDOW)
+
+    def configure_canary(self, version: Optional[str], traffic_percent: float):
+        """Set (or clear, with version=None) the canary candidate and reset its stats"""
+        with self._lock:
+            self.canary_version = version
+            self.canary_traffic_percent = traffic_percent if version else 0.0
+            self.canary_stats = {"requests": 0, "errors": 0}
+            self.canary_window = deque(maxlen=settings.CANARY_WINDOW)  # (latency, failed) pairs
+            self.canary_rolled_back = False
+            self.canary_rollback_reason = None
+
+    def run(self, sequence_input: np.ndarray, version: str, model: Any) -> Tuple[str, np.ndarray]:
+        """
+        Run the forward pass for one request, routing it to the canary when
+        sampled and queueing a shadow comparison when sampled.
+
+        Returns the version that actually produced the result and its output.
+        """
+        canary = self._pick_canary()
+        prediction = None
+
+        if canary is not None:
+            canary_version, canary_model = canary
+            start_time = time.perf_counter()
+            try:
+                prediction = canary_model.predict(sequence_input, verbose=0)
+                self._record_canary(time.perf_counter() - start_time, failed=False)
+                version = canary_version
+            except Exception as e:
+                print(f"Canary model {canary_version} failed, serving active model: {e}")
+                self._record_canary(time.perf_counter() - start_time, failed=True)
+
+        if prediction is None:
+            start_time = time.perf_counter()
+            prediction = model.predict(sequence_input, verbose=0)
+            with self._lock:
+                self.primary_latencies.append(time.perf_counter() - start_time)
+
+        self._maybe_shadow(sequence_input, version, prediction)
+        return version, prediction
+
+    def stats(self) -> Dict:
+        """Snapshot of shadow and canary statistics"""
+        with self._lock:
+            shadow_requests = self.shadow_stats["requests"]
+            completed = shadow_requests - self.shadow_stats["errors"]
+            return {
+                "active_version": self.registry.active_version,
+                "primary_latency": _latency_summary(self.primary_latencies),
+                "shadow": {
+                    "version": self.shadow_version,
+                    "sample_rate": self.shadow_sample_rate,
+                    "requests": shadow_requests,
+                    "errors": self.shadow_stats["errors"],
+                    "dropped": self.shadow_stats["dropped"],
+                    "pending": self._shadow_pending,
+                    "agreement_rate": round(1 - self.shadow_stats["disagreements"] / completed, 4) if completed else None,
+                    "mean_max_probability_abs_diff": round(self.shadow_stats["max_probability_abs_diff_sum"] / completed, 6) if completed else None,
+                    "latency": _latency_summary(self.shadow_latencies),
+                },
+                "canary": {
+                    "version": self.canary_version,
+                    "traffic_percent": self.canary_traffic_percent,
+                    "requests": self.canary_stats["requests"],
+                    "errors": self.canary_stats["errors"],
+                    "rolled_back": self.canary_rolled_back,
+                    "rollback_reason": self.canary_rollback_reason,
+                    "latency": _latency_summary(deque(latency for latency, _ in self.canary_window)),
+                },
+            }
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting shadow work and optionally wait for queued comparisons"""
+        self._shadow_executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def _pick_canary(self) -> Optional[Tuple[str, Any]]:
+        version = self.canary_version
+        if not version or self.canary_traffic_percent <= 0:
+            return None
+        if random.random() * 100 >= self.canary_traffic_percent:
+            return None
+        try:
+            return version, self.registry.get(version)
+        except KeyError:
+            return None
+
+    def _record_canary(self, latency: float, failed: bool):
+        with self._lock:
+            self.canary_stats["requests"] += 1
+            self.canary_stats["errors"] += int(failed)
+            self.canary_window.append((latency, failed))
+            if len(self.canary_window) < settings.CANARY_MIN_REQUESTS:
+                return
+
+            error_rate = sum(failed for _, failed in self.canary_window) / len(self.canary_window)
+            p95_ms = _latency_summary(deque(latency for latency, _ in self.canary_window))["p95_ms"]
+            if error_rate > settings.CANARY_MAX_ERROR_RATE:
+                reason = f"error rate {error_rate:.2%} exceeded {settings.CANARY_MAX_ERROR_RATE:.2%}"
+            elif p95_ms > settings.CANARY_MAX_P95_LATENCY_MS:
+                reason = f"p95 latency {p95_ms:.1f}ms exceeded {settings.CANARY_MAX_P95_LATENCY_MS:.1f}ms"
+            else:
+                return
+
+            self.canary_traffic_percent = 0.0
+            self.canary_rolled_back = True
+            self.canary_rollback_reason = reason
+        print(f"Canary model {self.canary_version} rolled back: {reason}")
+
+    def _maybe_shadow(self, sequence_input: np.ndarray, primary_version: str, primary_prediction: np.ndarray):
+        version = self.shadow_version
+        if not version or version == primary_version or random.random() >= self.shadow_sample_rate:
+            return
+        with self._lock:
+            if self._shadow_pending >= settings.SHADOW_MAX_PENDING:
+                self.shadow_stats["dropped"] += 1
+                return
+            self._shadow_pending += 1
+        try:
+            self._shadow_executor.submit(self._run_shadow, version, sequence_input, primary_prediction)
+        except RuntimeError:
+            # Executor already shut down
+            with self._lock:
+                self._shadow_pending -= 1
+
+    def _run_shadow(self, version: str, sequence_input: np.ndarray, primary_prediction: np.ndarray):
+        start_time = time.perf_counter()
+        try:
+            prediction = self.registry.get(version).predict(sequence_input, verbose=0)
+        except Exception as e:
+            with self._lock:
+                self._shadow_pending -= 1
+                self.shadow_stats["requests"] += 1
+                self.shadow_stats["errors"] += 1
+            print(f"Shadow model {version} failed: {e}")
+            return
+
+        latency = time.perf_counter() - start_time
+        with self._lock:
+            self._shadow_pending -= 1
+            if version != self.shadow_version:
+                return  # reconfigured while this comparison was queued
+            self.shadow_stats["requests"] += 1
+            self.shadow_latencies.append(latency)
+            if np.argmax(prediction, axis=1)[0] != np.argmax(primary_prediction, axis=1)[0]:
+                self.shadow_stats["disagreements"] += 1
+            self.shadow_stats["max_probability_abs_diff_sum"] += float(np.abs(prediction - primary_prediction).max())
\ No newline at end of file
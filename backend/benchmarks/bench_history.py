@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark for large prediction history pages.
+
+Compares the previous serialization path (ORM objects -> PredictionResponse
+-> FastAPI JSON encoding) with the column-tuple + orjson path used by
+/predictions/history, and times the full HTTP request as well as a
+conditional request answered with 304 Not Modified.
+
+Run from the backend directory:
+    python -m benchmarks.bench_history --rows 20000 --page-sizes 100,1000,10000
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import timeit
+
+# Point the app at a throwaway database before it is imported
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'bench_history.db')}"
+
+import json
+import orjson
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app.main import app
+from app.api.deps import get_current_user
+from app.core.database import SessionLocal
+from app.models.models import Prediction, User
+from app.schemas.prediction import PredictionResponse
+from app.services.ml_service import ml_service
+from app.api.api_v1.endpoints.predictions import PREDICTION_COLUMNS, _serialize_prediction
+
+def seed(rows: int) -> User:
+    """Create one user with `rows` predictions"""
+    db = SessionLocal()
+    user = User(email="bench@example.com", username="bench", hashed_password="x")
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+
+    created_at = datetime(2024, 1, 1)
+    db.bulk_insert_mappings(Prediction, [
+        {
+            "user_id": user.id,
+            "image_path": f"uploads/bench_{i}.png",
+            "image_filename": f"bench_{i}.png",
+            "prediction_result": "Malignant" if i % 3 else "Benign",
+            "confidence_score": 0.5 + (i % 50) / 100,
+            "probabilities": ml_service.encode_probabilities({
+                "Benign": 0.5 - (i % 50) / 100,
+                "Malignant": 0.5 + (i % 50) / 100,
+            }),
+            "processing_time": 0.1,
+            "model_version": "v1",
+            "inference_mode": "fast",
+            "created_at": created_at + timedelta(minutes=i),
+        }
+        for i in range(rows)
+    ])
+    db.commit()
+    db.refresh(user)
+    db.expunge(user)
+    db.close()
+    return user
+
+def legacy_history(user: User, limit: int) -> bytes:
+    """The previous implementation: hydrate ORM rows and build response models"""
+    db = SessionLocal()
+    try:
+        predictions = db.query(Prediction).filter(Prediction.user_id == user.id).offset(0).limit(limit).all()
+        responses = [
+            PredictionResponse(
+                id=pred.id,
+                prediction=pred.prediction_result,
+                confidence=pred.confidence_score,
+                processing_time=pred.processing_time,
+                probabilities={
+                    "Benign": 1 - pred.confidence_score if pred.prediction_result == "Malignant" else pred.confidence_score,
+                    "Malignant": pred.confidence_score if pred.prediction_result == "Malignant" else 1 - pred.confidence_score
+                },
+                model_version=pred.model_version,
+                inference_mode=pred.inference_mode,
+                image_filename=pred.image_filename,
+                created_at=pred.created_at
+            )
+            for pred in predictions
+        ]
+        return json.dumps(jsonable_encoder(responses)).encode()
+    finally:
+        db.close()
+
+def current_history(user: User, limit: int) -> bytes:
+    """The current serialization path, without the HTTP cache in front of it"""
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            select(*PREDICTION_COLUMNS).where(Prediction.user_id == user.id).offset(0).limit(limit)
+        ).all()
+        return orjson.dumps([_serialize_prediction(row) for row in rows])
+    finally:
+        db.close()
+
+def measure(func, repeat: int) -> float:
+    """Median milliseconds per call"""
+    func()
+    return statistics.median(timeit.repeat(func, repeat=repeat, number=1)) * 1000
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000, help="Predictions to seed")
+    parser.add_argument("--page-sizes", default="100,1000,10000", help="Comma-separated page sizes")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing runs per measurement")
+    args = parser.parse_args()
+
+    user = seed(args.rows)
+    app.dependency_overrides[get_current_user] = lambda: user
+    client = TestClient(app)
+
+    print(f"{'page size':>10}{'legacy ms':>14}{'orjson ms':>14}{'speedup':>10}{'HTTP ms':>12}{'HTTP 304 ms':>14}")
+    print("-" * 74)
+    for limit in (int(size) for size in args.page_sizes.split(",")):
+        legacy_ms = measure(lambda: legacy_history(user, limit), args.repeat)
+        current_ms = measure(lambda: current_history(user, limit), args.repeat)
+        url = f"/api/v1/predictions/history?limit={limit}"
+        http_ms = measure(lambda: client.get(url), args.repeat)
+        etag = client.get(url).headers["ETag"]
+        not_modified_ms = measure(lambda: client.get(url, headers={"If-None-Match": etag}), args.repeat)
+        print(f"{limit:>10}{legacy_ms:>14.2f}{current_ms:>14.2f}{legacy_ms / current_ms:>9.1f}x"
+              f"{http_ms:>12.2f}{not_modified_ms:>14.2f}")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the MLService pipeline stages.
+
+Times validate_image, preprocess_single_image, prepare_sequence_input and
+predict over synthetic images of several sizes and formats.
+
+Run from the backend directory:
+    python -m benchmarks.bench_ml_service --sizes 64,512,2048 --formats png,jpg
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import timeit
+from functools import partial
+
+import numpy as np
+from PIL import Image
+
+from app.services.ml_service import ml_service
+
+STAGES = {
+    "validate_image": ml_service.validate_image,
+    "preprocess_single_image": ml_service.preprocess_single_image,
+    "prepare_sequence_input": ml_service.prepare_sequence_input,
+    "prepare_sequence_input[augmented]": partial(ml_service.prepare_sequence_input, mode="augmented"),
+    "predict": partial(ml_service.predict, mode="fast"),
+    "predict[augmented]": partial(ml_service.predict, mode="augmented"),
+}
+
+def make_image(directory: str, size: int, fmt: str) -> str:
+    """Write a synthetic RGB scan-like image and return its path"""
+    rng = np.random.default_rng(size)
+    gradient = np.linspace(0, 255, size, dtype=np.float32)
+    base = (gradient[None, :] + gradient[:, None]) / 2
+    noise = rng.normal(0, 20, (size, size, 3))
+    pixels = np.clip(base[..., None] + noise, 0, 255).astype(np.uint8)
+
+    path = os.path.join(directory, f"bench_{size}.{fmt}")
+    Image.fromarray(pixels, "RGB").save(path)
+    return path
+
+def time_stage(func, image_path: str, repeat: int, number: int) -> dict:
+    """Time one stage and return per-call statistics in milliseconds"""
+    func(image_path)  # warm up caches and lazy TensorFlow initialisation
+    runs = timeit.repeat(lambda: func(image_path), repeat=repeat, number=number)
+    per_call = [run / number * 1000 for run in runs]
+    return {
+        "min_ms": round(min(per_call), 3),
+        "median_ms": round(statistics.median(per_call), 3),
+        "max_ms": round(max(per_call), 3),
+    }
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="64,256,1024,2048", help="Comma-separated square image sizes")
+    parser.add_argument("--formats", default="png,jpg,bmp,tiff", help="Comma-separated image formats")
+    parser.add_argument("--stages", default=",".join(STAGES), help="Comma-separated stages to benchmark")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timing runs per stage")
+    parser.add_argument("--number", type=int, default=3, help="Calls per timing run")
+    parser.add_argument("--json", dest="json_path", help="Also write results to this JSON file")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    formats = [fmt.strip().lower() for fmt in args.formats.split(",")]
+    stages = [stage.strip() for stage in args.stages.split(",")]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        print(f"Unknown stages: {', '.join(sorted(unknown))}")
+        return 1
+
+    results = []
+    print(f"{'stage':<36}{'format':<8}{'size':>6}{'min ms':>12}{'median ms':>12}{'max ms':>12}")
+    print("-" * 86)
+
+    with tempfile.TemporaryDirectory() as directory:
+        for fmt in formats:
+            for size in sizes:
+                image_path = make_image(directory, size, fmt)
+                for stage in stages:
+                    timing = time_stage(STAGES[stage], image_path, args.repeat, args.number)
+                    results.append({"stage": stage, "format": fmt, "size": size, **timing})
+                    print(f"{stage:<36}{fmt:<8}{size:>6}{timing['min_ms']:>12.3f}"
+                          f"{timing['median_ms']:>12.3f}{timing['max_ms']:>12.3f}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json_path}")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
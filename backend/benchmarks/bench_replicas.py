@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Throughput and tail latency of the inference runtime across replica and
+thread pool configurations on this machine.
+
+For every combination of --replicas and --threads, runs --requests
+predictions from --concurrency client threads and reports images/s and
+latency percentiles. A replica count of 0 is the in-process runtime,
+measured in a fresh interpreter so TensorFlow starts with the requested
+thread counts; otherwise a ReplicaPool is started with the CPUs split as
+in production (INFERENCE_REPLICA_CPUS or the NUMA layout) and
+TF_INTRA_OP_THREADS set to the thread count.
+
+Run from the backend directory:
+    python -m benchmarks.bench_replicas --replicas 0,1,2,4 --threads 1,2,4 --concurrency 8
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+import numpy as np
+from PIL import Image
+
+from app.core.config import settings
+
+def make_images(directory: str, count: int, size: int) -> List[str]:
+    """Write synthetic RGB scans and return their paths"""
+    rng = np.random.default_rng(size)
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"bench_{i}.png")
+        Image.fromarray(rng.integers(0, 255, (size, size, 3), dtype=np.uint8), "RGB").save(path)
+        paths.append(path)
+    return paths
+
+def run_load(predict: Callable, paths: List[str], requests: int, concurrency: int) -> dict:
+    """Drive predict from concurrency threads and summarise latency in milliseconds"""
+    def timed(i: int) -> float:
+        started = time.perf_counter()
+        result = predict(paths[i % len(paths)])
+        if result.get("error"):
+            raise RuntimeError(result["error"])
+        return (time.perf_counter() - started) * 1000
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(timed, range(concurrency)))  # warm up every worker and replica
+        started = time.perf_counter()
+        latencies = np.array(list(executor.map(timed, range(requests))))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "images_per_s": round(requests / elapsed, 2),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+    }
+
+def bench_in_process(threads: int, args: argparse.Namespace) -> dict:
+    """Measure the in-process runtime in a child interpreter started with the given thread counts"""
+    env = dict(os.environ, TF_INTRA_OP_THREADS=str(threads), TF_INTER_OP_THREADS=str(settings.TF_INTER_OP_THREADS or 1))
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_replicas", "--in-process",
+         "--requests", str(args.requests), "--concurrency", str(args.concurrency), "--size", str(args.size)],
+        env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def bench_replicas(replicas: int, threads: int, paths: List[str], args: argparse.Namespace) -> dict:
+    from app.services.inference_replicas import ReplicaPool, configured_core_sets
+
+    settings.TF_INTRA_OP_THREADS = threads
+    pool = ReplicaPool(configured_core_sets(replicas))
+    pool.start()
+    try:
+        while not all(replica["ready"] for replica in pool.stats()):
+            time.sleep(0.2)
+        return run_load(pool.predict, paths, args.requests, args.concurrency)
+    finally:
+        pool.close()
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--replicas", default="0,1,2", help="Comma-separated replica counts (0 = in-process)")
+    parser.add_argument("--threads", default="1,2", help="Comma-separated TensorFlow intra-op thread counts")
+    parser.add_argument("--requests", type=int, default=200, help="Timed predictions per configuration")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent client threads")
+    parser.add_argument("--size", type=int, default=512, help="Square size of the synthetic images")
+    parser.add_argument("--json", dest="json_path", help="Also write results to this JSON file")
+    parser.add_argument("--in-process", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = make_images(directory, 16, args.size)
+
+        if args.in_process:
+            from app.services.ml_service import ml_service
+            print(json.dumps(run_load(ml_service.predict, paths, args.requests, args.concurrency)))
+            return 0
+
+        print(f"CPUs available: {len(os.sched_getaffinity(0))}, "
+              f"{args.requests} requests from {args.concurrency} threads per configuration")
+        print(f"{'replicas':>8}{'threads':>9}{'images/s':>11}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}")
+        print("-" * 61)
+
+        results = []
+        for replicas in (int(value) for value in args.replicas.split(",")):
+            for threads in (int(value) for value in args.threads.split(",")):
+                if replicas:
+                    timing = bench_replicas(replicas, threads, paths, args)
+                else:
+                    timing = bench_in_process(threads, args)
+                results.append({"replicas": replicas, "threads": threads, **timing})
+                print(f"{replicas:>8}{threads:>9}{timing['images_per_s']:>11.2f}{timing['p50_ms']:>11.3f}"
+                      f"{timing['p95_ms']:>11.3f}{timing['p99_ms']:>11.3f}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json_path}")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,16 @@
+import os
+import tempfile
+
+# Settings are read when app modules are imported, so point them at a scratch
+# database and directories before any test module imports the app
+_scratch = tempfile.mkdtemp(prefix="cancerguard-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_scratch, 'test.db')}")
+os.environ.setdefault("MODEL_PATH", os.path.join(_scratch, "missing.h5"))
+os.environ.setdefault("MODEL_DIR", os.path.join(_scratch, "models"))
+os.environ.setdefault("UPLOAD_DIR", os.path.join(_scratch, "uploads"))
+os.environ.setdefault("UPLOAD_QUARANTINE_DIR", os.path.join(_scratch, "uploads_quarantine"))
+os.environ.setdefault("UPLOAD_ARCHIVE_DIR", os.path.join(_scratch, "uploads_archive"))
+os.environ.setdefault("EXPLAIN_CACHE_DIR", os.path.join(_scratch, "explanations"))
+os.environ.setdefault("EVENTS_BROKER", "memory")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("REDIS_URL", "redis://127.0.0.1:1")  # nothing listens; caches fall back
@@ -0,0 +1,33 @@
+import numpy as np
+
+from app.services.ml_service import AUGMENTATION_SCHEDULE, ml_service
+
+def _reference_frame(image: np.ndarray, flip: float, crop: float, gain: float, bias: float) -> np.ndarray:
+    """One augmented view built the slow way, frame by frame"""
+    height, width, _ = image.shape
+    # Same float32 arithmetic as the vectorised index maps, so truncation agrees at exact boundaries
+    scale = float(np.float32(1) - np.float32(2) * crop)
+    rows = [min(max(int(float(crop * np.float32(height)) + i * scale), 0), height - 1) for i in range(height)]
+    cols = [min(max(int(float(crop * np.float32(width)) + j * scale), 0), width - 1) for j in range(width)]
+    if flip:
+        cols = cols[::-1]
+    frame = image[np.ix_(rows, cols)]
+    return np.clip(frame * gain + bias, 0.0, 1.0)
+
+def test_augment_sequence_matches_per_frame_reference():
+    image = np.random.default_rng(0).random((20, 16, 3), dtype=np.float32)
+    sequence_length = 12  # longer than the schedule, so it wraps
+
+    frames = ml_service.augment_sequence(image, sequence_length)
+
+    assert frames.shape == (sequence_length, 20, 16, 3)
+    np.testing.assert_array_equal(frames[0], image)
+    np.testing.assert_array_equal(frames[1], image[:, ::-1])
+    for index in range(sequence_length):
+        expected = _reference_frame(image, *AUGMENTATION_SCHEDULE[index % len(AUGMENTATION_SCHEDULE)])
+        np.testing.assert_allclose(frames[index], expected, rtol=0, atol=1e-6)
+
+def test_augment_sequence_leaves_input_untouched():
+    image = np.full((8, 8, 3), 0.5, dtype=np.float32)
+    ml_service.augment_sequence(image, 10)
+    assert np.all(image == 0.5)
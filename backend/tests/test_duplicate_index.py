@@ -0,0 +1,81 @@
+import random
+
+from app.services import duplicate_index as duplicate_index_module
+from app.services.duplicate_index import DuplicateIndex
+
+def _brute_force(stored, value, max_distance, user_id=None, exclude_id=None):
+    matches = [
+        (prediction_id, (stored_value ^ value).bit_count())
+        for prediction_id, (stored_value, owner) in stored.items()
+        if prediction_id != exclude_id and (user_id is None or owner == user_id)
+    ]
+    return sorted(
+        [match for match in matches if match[1] <= max_distance],
+        key=lambda match: (match[1], -match[0])
+    )
+
+def _near(rng, value, flips):
+    for bit in rng.sample(range(64), flips):
+        value ^= 1 << bit
+    return value
+
+def test_search_matches_brute_force_hamming_scan(monkeypatch):
+    rng = random.Random(7)
+    index = DuplicateIndex()
+    monkeypatch.setattr(index, "refresh", lambda: None)
+
+    bases = [rng.getrandbits(64) for _ in range(20)]
+    stored = {}
+    for prediction_id in range(1, 501):
+        # Clusters of near-duplicates around a few bases, plus unrelated hashes
+        value = _near(rng, rng.choice(bases), rng.randint(0, 12)) if prediction_id % 3 else rng.getrandbits(64)
+        user_id = rng.randint(1, 3)
+        stored[prediction_id] = (value, user_id)
+        index.add(prediction_id, user_id, f"{value:016x}")
+
+    for _ in range(200):
+        value = _near(rng, rng.choice(bases), rng.randint(0, 6))
+        max_distance = rng.choice([0, 2, 4, 8, 11])
+        user_id = rng.choice([None, 1, 2])
+        exclude_id = rng.choice([None, rng.randint(1, 500)])
+        assert index.search(f"{value:016x}", max_distance, user_id=user_id, exclude_id=exclude_id) == \
+            _brute_force(stored, value, max_distance, user_id, exclude_id)
+
+class _FakeSession:
+    def __init__(self, rows, during_query=None):
+        self._rows = rows
+        self._during_query = during_query
+
+    def execute(self, statement):
+        if self._during_query:
+            self._during_query()
+        return self
+
+    def all(self):
+        return self._rows
+
+    def close(self):
+        pass
+
+def test_full_reload_keeps_current_index_until_swap(monkeypatch):
+    index = DuplicateIndex()
+    rows = [(1, 1, "00000000000000ff"), (2, 1, "ffffffffffffffff")]
+    monkeypatch.setattr(duplicate_index_module, "SessionLocal", lambda: _FakeSession(rows))
+    index.refresh()
+    assert len(index) == 2
+
+    seen_during_reload = []
+    reloaded = [(2, 1, "ffffffffffffffff"), (3, 2, "00000000000000fe")]
+    monkeypatch.setattr(
+        duplicate_index_module, "SessionLocal",
+        lambda: _FakeSession(reloaded, during_query=lambda: seen_during_reload.append(sorted(index._entries)))
+    )
+    index._loaded_at = 0.0
+    index.refresh()
+
+    # Lookups racing the reload still see the old rows rather than an empty index
+    assert seen_during_reload == [[1, 2]]
+    assert len(index) == 2
+    assert index._last_id == 3
+    monkeypatch.setattr(index, "refresh", lambda: None)
+    assert index.search("00000000000000ff", 1) == [(3, 1)]
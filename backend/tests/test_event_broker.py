@@ -0,0 +1,42 @@
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.core.config import settings
+from app.services import event_broker as event_broker_module
+from app.services.event_broker import EventBroker
+
+class _FailingScript:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, keys, args):
+        self.calls += 1
+        raise RedisConnectionError("connection refused")
+
+def test_publish_backs_off_after_redis_failure(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(event_broker_module.time, "monotonic", lambda: now[0])
+    broker = EventBroker("redis", replay_size=10, subscriber_queue=10)
+    script = _FailingScript()
+    broker._script = script
+
+    for _ in range(3):
+        broker.publish("user:1", "prediction.completed", {"id": 1})
+    assert script.calls == 1
+
+    now[0] += settings.EVENTS_REDIS_RETRY_SECONDS - 1
+    broker.publish("user:1", "prediction.completed", {"id": 1})
+    assert script.calls == 1
+
+    now[0] += 1
+    broker.publish("user:1", "prediction.completed", {"id": 1})
+    assert script.calls == 2
+
+def test_memory_publish_assigns_increasing_ids_and_replays():
+    broker = EventBroker("memory", replay_size=2, subscriber_queue=10)
+    for i in range(3):
+        broker.publish("user:1", "prediction.completed", {"id": i})
+    broker.publish("user:2", "prediction.completed", {"id": 99})
+
+    replayed = list(broker._replay["user:1"])
+    assert [event.id for event in replayed] == [2, 3]
+    assert broker._replay["user:2"][0].id == 4
@@ -0,0 +1,22 @@
+from app.core.http_cache import ENCODERS, _etag_matches, _negotiate_encoding
+
+def test_etag_matches_weak_and_strong_forms():
+    assert _etag_matches('W/"abc"', 'W/"abc"')
+    assert _etag_matches('"abc"', 'W/"abc"')
+    assert _etag_matches('"old", W/"abc"', 'W/"abc"')
+    assert _etag_matches("*", 'W/"abc"')
+    assert not _etag_matches('W/"old"', 'W/"abc"')
+    assert not _etag_matches('"abcd"', 'W/"abc"')
+
+def test_negotiate_encoding_prefers_supported_codings():
+    preferred = next(iter(ENCODERS))  # br when brotli is installed, otherwise gzip
+    assert _negotiate_encoding("gzip, deflate, br") == preferred
+    assert _negotiate_encoding("gzip") == "gzip"
+    assert _negotiate_encoding("GZIP;q=0.5") == "gzip"
+
+def test_negotiate_encoding_honours_refusals_and_falls_back_to_identity():
+    assert _negotiate_encoding("") == "identity"
+    assert _negotiate_encoding("deflate") == "identity"
+    assert _negotiate_encoding("gzip;q=0") == "identity"
+    assert _negotiate_encoding("gzip;q=0.0, br;q=0") == "identity"
+    assert _negotiate_encoding("gzip;q=bogus") == "identity"
@@ -0,0 +1,61 @@
+import threading
+
+import pytest
+
+from app.services.inference_scheduler import (
+    InferenceScheduler, SchedulerClosedError, SchedulerFullError
+)
+
+def _queue(scheduler: InferenceScheduler, priority: str, count: int):
+    for i in range(count):
+        scheduler._queues[priority].append((0.0, None, None, None, (f"{priority}-{i}",), {}))
+
+def _dispatch_order(scheduler: InferenceScheduler, count: int):
+    return [scheduler._next_job()[0] for _ in range(count)]
+
+def test_interactive_goes_first_when_bulk_has_had_its_share():
+    scheduler = InferenceScheduler(workers=1, bulk_min_share=0.2, max_queued=100)
+    scheduler._recent_dispatches.extend(["bulk"] * 5)
+    _queue(scheduler, "interactive", 3)
+    _queue(scheduler, "bulk", 3)
+
+    assert _dispatch_order(scheduler, 3) == ["interactive"] * 3
+
+def test_bulk_gets_its_minimum_share_under_interactive_load():
+    scheduler = InferenceScheduler(workers=1, bulk_min_share=0.2, max_queued=1000)
+    _queue(scheduler, "interactive", 500)
+    _queue(scheduler, "bulk", 500)
+
+    order = _dispatch_order(scheduler, 100)
+    # First dispatch goes to bulk (no history), then bulk holds about 20% of every window
+    assert order[0] == "bulk"
+    assert 18 <= order.count("bulk") <= 22
+    for start in range(0, 81):
+        assert 3 <= order[start:start + 20].count("bulk") <= 5
+
+def test_single_class_is_served_in_fifo_order():
+    scheduler = InferenceScheduler(workers=1, bulk_min_share=0.2, max_queued=100)
+    _queue(scheduler, "bulk", 3)
+    jobs = [scheduler._next_job() for _ in range(3)]
+    assert [priority for priority, _ in jobs] == ["bulk"] * 3
+    assert [job[4][0] for _, job in jobs] == ["bulk-0", "bulk-1", "bulk-2"]
+
+def test_full_queue_and_closed_scheduler_raise_distinct_errors():
+    scheduler = InferenceScheduler(workers=1, bulk_min_share=0.2, max_queued=1)
+    blocker, started = threading.Event(), threading.Event()
+    scheduler.submit(lambda: started.set() or blocker.wait())  # occupies the worker
+    assert started.wait(timeout=5)
+    scheduler.submit(lambda: None)  # fills the interactive queue
+    with pytest.raises(SchedulerFullError):
+        scheduler.submit(lambda: None)
+
+    blocker.set()
+    assert scheduler.drain(timeout=5)["idle"]
+    with pytest.raises(SchedulerClosedError):
+        scheduler.submit(lambda: None)
+    assert not issubclass(SchedulerClosedError, SchedulerFullError)
+
+def test_submitted_jobs_return_results():
+    scheduler = InferenceScheduler(workers=2, bulk_min_share=0.2, max_queued=10)
+    futures = [scheduler.submit(pow, 2, n, priority="bulk" if n % 2 else "interactive") for n in range(6)]
+    assert [future.result(timeout=5) for future in futures] == [1, 2, 4, 8, 16, 32]
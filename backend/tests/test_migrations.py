@@ -0,0 +1,74 @@
+from sqlalchemy import (
+    Boolean, Column, DateTime, Float, ForeignKey, Integer, MetaData, String, Table, Text,
+    create_engine, inspect, text
+)
+
+from app.core.migrations import upgrade_schema
+
+def _baseline_engine(path):
+    """A database with the users and predictions tables as the first release created them"""
+    engine = create_engine(f"sqlite:///{path}")
+    metadata = MetaData()
+    Table(
+        "users", metadata,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("email", String, unique=True, index=True, nullable=False),
+        Column("username", String, unique=True, index=True, nullable=False),
+        Column("hashed_password", String, nullable=False),
+        Column("full_name", String),
+        Column("is_active", Boolean),
+        Column("is_superuser", Boolean),
+        Column("created_at", DateTime(timezone=True)),
+        Column("updated_at", DateTime(timezone=True)),
+    )
+    Table(
+        "predictions", metadata,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+        Column("image_path", String, nullable=False),
+        Column("prediction_result", String, nullable=False),
+        Column("confidence_score", Float, nullable=False),
+        Column("processing_time", Float),
+        Column("created_at", DateTime(timezone=True)),
+        Column("image_filename", String),
+        Column("image_size", Integer),
+        Column("notes", Text),
+    )
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, email, username, hashed_password) VALUES (1, 'a@b.c', 'a', 'x')"))
+        conn.execute(text(
+            "INSERT INTO predictions (id, user_id, image_path, prediction_result, confidence_score) "
+            "VALUES (1, 1, 'uploads/a.png', 'Benign', 0.9)"
+        ))
+    return engine
+
+def test_upgrade_adds_columns_and_indexes_to_baseline_schema(tmp_path):
+    engine = _baseline_engine(tmp_path / "baseline.db")
+
+    added = upgrade_schema(engine)
+
+    assert set(added) == {
+        "predictions.model_version", "predictions.inference_mode", "predictions.probabilities",
+        "predictions.image_phash", "predictions.duplicate_of", "users.role",
+    }
+    inspector = inspect(engine)
+    indexes = {index["name"] for index in inspector.get_indexes("predictions")}
+    assert {"ix_predictions_user_id", "ix_predictions_image_path", "ix_predictions_model_version"} <= indexes
+    foreign_keys = inspector.get_foreign_keys("predictions")
+    assert any(fk["constrained_columns"] == ["duplicate_of"] and fk["referred_table"] == "predictions"
+               for fk in foreign_keys)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT role FROM users WHERE id = 1")).scalar() == "clinician"
+        row = conn.execute(text("SELECT model_version, probabilities, image_phash FROM predictions")).one()
+        assert tuple(row) == (None, None, None)
+
+def test_upgrade_is_idempotent(tmp_path):
+    engine = _baseline_engine(tmp_path / "baseline.db")
+    upgrade_schema(engine)
+    assert upgrade_schema(engine) == []
+
+def test_upgrade_skips_tables_that_do_not_exist_yet(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'empty.db'}")
+    assert upgrade_schema(engine) == []
+    assert inspect(engine).get_table_names() == []
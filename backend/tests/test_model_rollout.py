@@ -0,0 +1,28 @@
+import numpy as np
+
+from app.services.model_registry import ModelRegistry
+from app.services.model_rollout import ModelRollout
+
+class _FixedModel:
+    def __init__(self, output):
+        self.output = np.array([output], dtype=np.float32)
+
+    def predict(self, sequence_input, verbose=0):
+        return self.output
+
+def test_shadow_reports_mean_of_largest_probability_difference():
+    registry = ModelRegistry(loader=lambda path: None, warmup=lambda model: None)
+    registry.register("v1", _FixedModel([0.9, 0.1]))
+    registry.register("v2", _FixedModel([0.6, 0.4]), activate=False)
+    rollout = ModelRollout(registry)
+    rollout.configure_shadow("v2", 1.0)
+
+    rollout._run_shadow("v2", np.zeros((1, 1)), np.array([[0.9, 0.1]], dtype=np.float32))
+    rollout._run_shadow("v2", np.zeros((1, 1)), np.array([[0.5, 0.5]], dtype=np.float32))
+
+    shadow = rollout.stats()["shadow"]
+    assert shadow["requests"] == 2
+    assert shadow["agreement_rate"] == 1.0
+    # max |diff| per request is 0.3 then 0.1
+    assert shadow["mean_max_probability_abs_diff"] == 0.2
+    rollout.shutdown()
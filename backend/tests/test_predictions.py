@@ -0,0 +1,82 @@
+import argparse
+import os
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from app.api.api_v1.endpoints.predictions import _reusable_result
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.jobs.reconcile_uploads import archive_old_uploads
+from app.models.models import Base, Prediction, User
+from app.services.ml_service import ml_service
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'predictions.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(User(id=1, email="a@example.com", username="a", hashed_password="x"))
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+def test_reused_result_keeps_original_processing_time(db):
+    db.add(Prediction(
+        id=7, user_id=1, image_path="uploads/a.png", prediction_result="Benign",
+        confidence_score=0.9, processing_time=1.75, model_version=ml_service.model_version,
+        inference_mode="fast"
+    ))
+    db.commit()
+
+    result = _reusable_result(db, [(7, settings.DUPLICATE_REUSE_MAX_DISTANCE)], 1, "fast")
+
+    assert result["duplicate_of"] == 7
+    assert result["processing_time"] == 1.75
+    assert _reusable_result(db, [(7, settings.DUPLICATE_REUSE_MAX_DISTANCE + 1)], 1, "fast") is None
+    assert _reusable_result(db, [(7, 0)], 1, "augmented") is None
+
+def _auth_headers(client) -> dict:
+    name = uuid.uuid4().hex[:8]
+    client.post("/api/v1/auth/register", json={"email": f"{name}@example.com", "username": name, "password": "pw123456"})
+    response = client.post("/api/v1/auth/login", data={"username": f"{name}@example.com", "password": "pw123456"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def test_explanation_of_archived_prediction_is_conflict():
+    from app.main import app
+
+    client = TestClient(app)
+    headers = _auth_headers(client)
+    app_db = SessionLocal()
+    try:
+        os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+        image_path = os.path.join(settings.UPLOAD_DIR, f"{uuid.uuid4()}_scan.png")
+        # Uncompressed flat image, so gzip shrinks it and the job archives it
+        Image.new("RGB", (64, 64), (90, 90, 90)).save(image_path, compress_level=0)
+        user_id = app_db.scalar(select(User.id).order_by(User.id.desc()))
+        prediction = Prediction(
+            user_id=user_id, image_path=image_path, prediction_result="Benign", confidence_score=0.9,
+            model_version=ml_service.model_version, inference_mode="fast",
+            created_at=datetime.now(timezone.utc) - timedelta(days=30)
+        )
+        app_db.add(prediction)
+        app_db.commit()
+
+        stats = defaultdict(int)
+        archive_old_uploads(argparse.Namespace(archive_after_days=7, batch_size=100, dry_run=False), stats)
+        app_db.refresh(prediction)
+        assert stats["archived"] == 1
+        assert prediction.image_path.endswith(".gz") and not os.path.exists(image_path)
+
+        response = client.get(f"/api/v1/predictions/{prediction.id}/explanation", headers=headers)
+        assert response.status_code == 409
+        assert response.json()["detail"] == "Image for this prediction has been archived"
+    finally:
+        app_db.close()
@@ -0,0 +1,86 @@
+import pytest
+from jose import jwt
+from starlette.requests import Request
+
+from app.core import rate_limit
+from app.core.config import settings
+from app.core.rate_limit import LocalTokenBuckets, _buckets_for
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    return clock
+
+def _request(method: str, path: str, token: str = None, query: str = "") -> Request:
+    headers = [(b"authorization", f"Bearer {token}".encode())] if token else []
+    return Request({
+        "type": "http", "method": method, "path": path, "query_string": query.encode(),
+        "headers": headers, "client": ("203.0.113.7", 5000),
+    })
+
+def _token(subject: str) -> str:
+    return jwt.encode({"sub": subject}, settings.JWT_SECRET_KEY, algorithm=settings.ALGORITHM)
+
+def test_local_buckets_allow_burst_then_report_wait(clock):
+    buckets = LocalTokenBuckets()
+    bucket = [("k", 3, 1.0)]  # capacity 3, one token per second
+
+    assert [buckets.acquire(bucket)[0] for _ in range(3)] == [True, True, True]
+    allowed, wait = buckets.acquire(bucket)
+    assert not allowed
+    assert wait == pytest.approx(1.0)
+
+    clock.now += 1.0
+    assert buckets.acquire(bucket) == (True, 0.0)
+
+def test_local_buckets_refill_up_to_capacity(clock):
+    buckets = LocalTokenBuckets()
+    bucket = [("k", 2, 10.0)]
+    buckets.acquire(bucket)
+    buckets.acquire(bucket)
+
+    clock.now += 60
+    assert [buckets.acquire(bucket)[0] for _ in range(3)] == [True, True, False]
+
+def test_local_buckets_charge_nothing_when_any_bucket_is_empty(clock):
+    buckets = LocalTokenBuckets()
+    own, shared = ("own", 5, 1.0), ("shared", 1, 0.1)
+    assert buckets.acquire([own, shared])[0]
+
+    allowed, wait = buckets.acquire([own, shared])
+    assert not allowed
+    assert wait == pytest.approx(10.0)
+    # The rejected request left the caller's own bucket at 4 tokens
+    assert [buckets.acquire([own])[0] for _ in range(5)] == [True, True, True, True, False]
+
+def test_authenticated_upload_is_charged_to_user_and_global_buckets():
+    keys = [key for key, _, _ in _buckets_for(_request("POST", "/api/v1/predictions/upload", _token("a@b.c")))]
+    assert keys == ["ratelimit:inference:user:a@b.c", "ratelimit:inference:global"]
+
+def test_anonymous_upload_is_limited_per_address_only():
+    keys = [key for key, _, _ in _buckets_for(_request("POST", "/api/v1/predictions/upload"))]
+    assert keys == ["ratelimit:inference:ip:203.0.113.7"]
+
+def test_invalid_token_counts_as_anonymous():
+    keys = [key for key, _, _ in _buckets_for(_request("POST", "/api/v1/predictions/upload", "not-a-jwt"))]
+    assert keys == ["ratelimit:inference:ip:203.0.113.7"]
+
+def test_explanation_is_an_inference_route():
+    keys = [key for key, _, _ in _buckets_for(_request("GET", "/api/v1/predictions/42/explanation", _token("a@b.c")))]
+    assert keys[0] == "ratelimit:inference:user:a@b.c"
+
+def test_event_stream_token_in_query_selects_user_read_bucket():
+    request = _request("GET", "/api/v1/events/stream", query=f"token={_token('a@b.c')}")
+    assert [key for key, _, _ in _buckets_for(request)] == ["ratelimit:read:user:a@b.c"]
+
+def test_routes_outside_the_api_and_preflights_are_not_limited():
+    assert _buckets_for(_request("GET", "/health")) is None
+    assert _buckets_for(_request("OPTIONS", "/api/v1/predictions/upload")) is None
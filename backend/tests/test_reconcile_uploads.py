@@ -0,0 +1,60 @@
+import argparse
+import os
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from PIL import Image
+
+from app.core.config import settings
+from app.core.database import SessionLocal, engine
+from app.jobs.reconcile_uploads import _archive_file, archive_old_uploads
+from app.models.models import Base, Prediction, User
+
+def _old_prediction(db, user_id: int, image_path: str) -> Prediction:
+    prediction = Prediction(
+        user_id=user_id, image_path=image_path, prediction_result="Benign", confidence_score=0.9,
+        created_at=datetime.now(timezone.utc) - timedelta(days=30)
+    )
+    db.add(prediction)
+    db.commit()
+    return prediction
+
+def test_archive_skips_images_gzip_cannot_shrink():
+    Base.metadata.create_all(bind=engine)
+    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    db = SessionLocal()
+    try:
+        name = uuid.uuid4().hex[:8]
+        user = User(email=f"{name}@example.com", username=name, hashed_password="x")
+        db.add(user)
+        db.commit()
+
+        flat_path = os.path.join(settings.UPLOAD_DIR, f"{uuid.uuid4()}_flat.png")
+        Image.new("RGB", (128, 128), (90, 90, 90)).save(flat_path, compress_level=0)
+        noise_path = os.path.join(settings.UPLOAD_DIR, f"{uuid.uuid4()}_noise.png")
+        Image.frombytes("RGB", (128, 128), os.urandom(128 * 128 * 3)).save(noise_path)
+        flat = _old_prediction(db, user.id, flat_path)
+        noise = _old_prediction(db, user.id, noise_path)
+        flat_size = os.path.getsize(flat_path)
+
+        stats = defaultdict(int)
+        archive_old_uploads(argparse.Namespace(archive_after_days=7, batch_size=100, dry_run=False), stats)
+        db.refresh(flat)
+        db.refresh(noise)
+
+        assert stats["archived"] == 1 and stats["archive_skipped"] == 1
+        assert 0 < stats["archived_bytes"] < flat_size
+        assert flat.image_path.endswith(".gz") and not os.path.exists(flat_path)
+        # The incompressible image stays where it was, still referenced by its row
+        assert noise.image_path == noise_path and os.path.exists(noise_path)
+    finally:
+        db.close()
+
+def test_archive_file_writes_nothing_when_not_smaller(tmp_path):
+    source = tmp_path / "noise.bin"
+    source.write_bytes(os.urandom(64 * 1024))
+    target = tmp_path / "noise.bin.gz"
+
+    assert _archive_file(str(source), str(target)) is None
+    assert os.listdir(tmp_path) == ["noise.bin"]